@@ -0,0 +1,250 @@
+# ./analytics.py
+import os
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from history_store import HistoryStore, dividends_from
+
+logger = logging.getLogger(__name__)
+
+IMPACT_LOOKBACK_DAYS = 365
+
+METRIC_COLUMNS = ['div_annual', 'div_growth_5y', 'div_streak_years', 'div_impact_avg']
+
+TRADING_DAYS = 252
+
+VOLATILITY_WINDOW = 21
+
+
+def dividend_price_impact(hist, dividends, lookback_days=IMPACT_LOOKBACK_DAYS):
+    # Open of the first bar to close of the last bar within one day either side of
+    # each ex-dividend date, for dividends in the lookback window. Numeric only;
+    # callers format for display.
+    if dividends.empty or hist.empty:
+        return None, pd.DataFrame(columns=['Date', 'Open', 'Close', 'Dividend', 'Impact'])
+
+    cutoff = pd.Timestamp.now(tz=dividends.index.tz) - pd.Timedelta(days=lookback_days)
+    recent = dividends[dividends.index > cutoff]
+
+    index = hist.index
+    one_day = pd.Timedelta(days=1)
+    lo = index.searchsorted(recent.index - one_day, side='left')
+    hi = index.searchsorted(recent.index + one_day, side='right') - 1
+    valid = hi >= lo
+
+    open_prices = hist['Open'].to_numpy(dtype=float)[lo[valid]]
+    close_prices = hist['Close'].to_numpy(dtype=float)[hi[valid]]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        impact = (close_prices - open_prices) / open_prices * 100
+
+    impacts_df = pd.DataFrame({
+        'Date': recent.index[valid],
+        'Open': open_prices,
+        'Close': close_prices,
+        'Dividend': recent.to_numpy(dtype=float)[valid],
+        'Impact': impact,
+    })
+    if impacts_df.empty:
+        return None, impacts_df
+    return float(impact.mean()), impacts_df
+
+
+def dividend_history(dividends):
+    # Annual totals, YoY change (%) and the number of consecutive trailing years
+    # with a payment
+    if dividends.empty:
+        return pd.DataFrame(), pd.DataFrame(), 0
+
+    annual_div = dividends.resample('YE').sum()
+    div_changes = annual_div.pct_change() * 100
+
+    # resample fills gap years with 0, so the streak stops at the last unpaid year
+    unpaid = np.flatnonzero(annual_div.to_numpy()[::-1] <= 0)
+    streak = int(unpaid[0]) if len(unpaid) else len(annual_div)
+
+    return annual_div, div_changes, streak
+
+
+def dividend_metrics(hist, lookback_days=IMPACT_LOOKBACK_DAYS):
+    # Per-symbol screener columns derived from one cached history. The current
+    # calendar year is still being paid, so growth and streak use complete years
+    # only and the annual amount is the trailing twelve months
+    dividends = dividends_from(hist)
+    avg_impact, _ = dividend_price_impact(hist, dividends, lookback_days)
+    if dividends.empty:
+        return {'div_annual': np.nan, 'div_growth_5y': np.nan,
+                'div_streak_years': 0, 'div_impact_avg': np.nan}
+
+    now = pd.Timestamp.now(tz=dividends.index.tz)
+    trailing = dividends[dividends.index > now - pd.Timedelta(days=365)]
+    year_start = now.normalize().replace(month=1, day=1)
+    _, div_changes, streak = dividend_history(dividends[dividends.index < year_start])
+    growth = (div_changes.tail(5).replace([np.inf, -np.inf], np.nan).mean()
+              if len(div_changes) else np.nan)
+    return {
+        'div_annual': float(trailing.sum()),
+        'div_growth_5y': float(growth),
+        'div_streak_years': streak,
+        'div_impact_avg': np.nan if avg_impact is None else avg_impact,
+    }
+
+
+def _metrics_for_symbols(cache_dir, symbols):
+    # Runs in the worker: each process maps the history files itself, so only
+    # symbol names go in and small dicts come back across the process boundary
+    store = HistoryStore(cache_dir)
+    rows = []
+    for symbol in symbols:
+        if not store.exists(symbol):
+            continue
+        try:
+            metrics = dividend_metrics(store.read(symbol))
+        except Exception as e:
+            logger.error(f"Error computing dividend metrics for {symbol}: {e}")
+            continue
+        rows.append({'symbol': symbol, **metrics})
+    return rows
+
+
+def batch_dividend_metrics(symbols=None, store=None, processes=1, chunk_size=64):
+    # One pass over the history cache; returns a frame keyed by symbol.
+    # processes > 1 spreads symbol chunks over a process pool.
+    store = store or HistoryStore()
+    symbols = store.symbols() if symbols is None else list(symbols)
+
+    if processes is None or processes > 1:
+        processes = processes or os.cpu_count()
+        chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+        rows = []
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for chunk_rows in executor.map(_metrics_for_symbols,
+                                           [store.cache_dir] * len(chunks), chunks):
+                rows.extend(chunk_rows)
+    else:
+        rows = _metrics_for_symbols(store.cache_dir, symbols)
+
+    return pd.DataFrame(rows, columns=['symbol'] + METRIC_COLUMNS)
+
+
+def update_fundamentals(symbols=None, history_store=None, fundamentals_store=None, processes=1):
+    # Store the dividend metrics as columns next to the fundamentals so the
+    # screener can filter on them without touching the histories
+    from fundamentals_store import FundamentalsStore
+    fundamentals_store = fundamentals_store or FundamentalsStore()
+    metrics = batch_dividend_metrics(symbols, history_store, processes=processes)
+    known = fundamentals_store.symbols()
+    metrics = metrics[metrics['symbol'].isin(known)]
+    fundamentals_store.upsert(metrics)
+    logger.info(f"Updated dividend metrics for {len(metrics)} symbols")
+    return metrics
+
+
+def aligned_closes(symbols, store=None, start=None):
+    # Closes of several symbols on one calendar-day axis: (days, matrix) with
+    # matrix a C-contiguous float64 array of shape (len(days), len(symbols)).
+    # Days are local exchange dates; a day one symbol did not trade carries its
+    # previous close forward, days before its first bar stay NaN.
+    store = store or HistoryStore()
+    columns = [store.read_daily_closes(symbol, start=start) for symbol in symbols]
+
+    days = np.unique(np.concatenate([d for d, _ in columns])) if columns else \
+        np.array([], dtype='datetime64[D]')
+    matrix = np.full((len(days), len(columns)), np.nan)
+    for j, (symbol_days, closes) in enumerate(columns):
+        matrix[np.searchsorted(days, symbol_days), j] = closes
+
+    # Forward fill down each column: index of the last valid row at or above each cell
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(days))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    matrix = matrix[rows, np.arange(len(columns))]
+    return pd.DatetimeIndex(days), np.ascontiguousarray(matrix)
+
+
+def normalized_performance(matrix):
+    # Percent change since each column's first valid close
+    first = np.argmax(~np.isnan(matrix), axis=0)
+    base = matrix[first, np.arange(matrix.shape[1])]
+    return (matrix / base - 1) * 100
+
+
+def daily_returns(matrix):
+    returns = np.full(matrix.shape, np.nan)
+    returns[1:] = matrix[1:] / matrix[:-1] - 1
+    return returns
+
+
+def rolling_volatility(returns, window=VOLATILITY_WINDOW):
+    # Annualized standard deviation of the last `window` daily returns, from
+    # running sums so every column and every row is one vectorized pass
+    valid = ~np.isnan(returns)
+    x = np.where(valid, returns, 0.0)
+    sums = [np.cumsum(a, axis=0) for a in (valid.astype(float), x, x * x)]
+    for i, cumulative in enumerate(sums):
+        lagged = np.zeros_like(cumulative)
+        lagged[window:] = cumulative[:-window]
+        sums[i] = cumulative - lagged
+    n, s1, s2 = sums
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (s2 - s1 * s1 / n) / (n - 1)
+    variance[n < window] = np.nan
+    return np.sqrt(np.clip(variance, 0, None) * TRADING_DAYS) * 100
+
+
+def drawdown(matrix):
+    # Percent below the running peak close
+    peak = np.fmax.accumulate(matrix, axis=0)
+    return (matrix / peak - 1) * 100
+
+
+def return_correlation(returns):
+    # Pairwise-complete correlation of daily returns: every pair uses the days
+    # both symbols have, computed with matrix products instead of a pair loop
+    valid = (~np.isnan(returns)).astype(float)
+    x = np.where(valid > 0, returns, 0.0)
+    n = valid.T @ valid
+    sum_x = x.T @ valid               # [i, j]: sum of i's returns on days j also has
+    sum_xx = (x * x).T @ valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = x.T @ x - sum_x * sum_x.T / n
+        var = sum_xx - sum_x * sum_x / n
+        corr = cov / np.sqrt(var * var.T)
+    corr[n < 2] = np.nan
+    return np.clip(corr, -1, 1)
+
+
+def compare(symbols, store=None, start=None, window=VOLATILITY_WINDOW):
+    # Everything the comparison view shows, from one aligned close matrix;
+    # None when no symbol has a bar in the range
+    symbols = list(symbols)
+    days, closes = aligned_closes(symbols, store, start)
+    if not len(days):
+        return None
+    returns = daily_returns(closes)
+    frame = lambda values: pd.DataFrame(values, index=days, columns=symbols, copy=False)
+    performance = normalized_performance(closes)
+    volatility = rolling_volatility(returns, window)
+    drawdowns = drawdown(closes)
+
+    summary = pd.DataFrame({
+        'Return %': performance[-1],
+        'Volatility %': volatility[-1],
+        'Max Drawdown %': drawdowns.min(axis=0, initial=0.0, where=~np.isnan(drawdowns)),
+    }, index=pd.Index(symbols, name='Symbol'))
+    return {
+        'performance': frame(performance),
+        'volatility': frame(volatility),
+        'drawdown': frame(drawdowns),
+        'correlation': pd.DataFrame(return_correlation(returns), index=symbols, columns=symbols),
+        'summary': summary,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Compute dividend metrics for every cached history")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help="worker processes (1 runs in this interpreter)")
+    args = parser.parse_args()
+    update_fundamentals(processes=args.processes)
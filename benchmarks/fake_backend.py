@@ -0,0 +1,119 @@
+# ./benchmarks/fake_backend.py
+import contextlib
+import time
+import zlib
+import numpy as np
+import pandas as pd
+import requests
+import yfinance as yf
+import transport
+from benchmarks.synthetic import make_info, make_history
+
+NASDAQ_SCREENER_URL = 'https://api.nasdaq.com/api/screener/stocks'
+
+
+class FakeBackend:
+    # Local stand-in for yfinance and the Nasdaq screener endpoint. Every call
+    # sleeps for the injected latency so network-bound stages can be timed.
+
+    def __init__(self, symbols, years=20, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.symbols = list(symbols)
+        self.years = years
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = np.random.default_rng(seed)
+        self.calls = {'info': 0, 'history': 0, 'download': 0, 'screener': 0}
+        self._histories = {}
+
+    def sleep(self):
+        delay = self.latency
+        if self.jitter:
+            delay += float(self.rng.uniform(0, self.jitter))
+        if delay > 0:
+            time.sleep(delay)
+
+    def history_for(self, symbol):
+        if symbol not in self._histories:
+            self._histories[symbol] = make_history(symbol, self.years)
+        return self._histories[symbol]
+
+    def ticker(self, symbol, session=None, proxy=None):
+        return FakeTicker(self, symbol)
+
+    def download(self, tickers, **kwargs):
+        self.calls['download'] += 1
+        self.sleep()
+        tickers = tickers.split() if isinstance(tickers, str) else list(tickers)
+        return pd.concat({symbol: self.history_for(symbol) for symbol in tickers}, axis=1)
+
+    def get(self, url, *args, **kwargs):
+        if url.startswith(NASDAQ_SCREENER_URL):
+            self.calls['screener'] += 1
+            self.sleep()
+            return FakeResponse({'data': {'rows': [{'symbol': s, 'name': f"{s} Holdings Inc."}
+                                                   for s in self.symbols]}})
+        raise ConnectionError(f"Fake backend has no route for {url}")
+
+    @contextlib.contextmanager
+    def install(self):
+        # Patch the module attributes the app looks up at call time
+        patches = [(yf, 'Ticker', self.ticker), (yf, 'download', self.download),
+                   (requests, 'get', self.get),
+                   (transport, 'get_session', lambda pool_size=10: FakeSession(self))]
+        originals = [(module, name, getattr(module, name)) for module, name, _ in patches]
+        try:
+            for module, name, value in patches:
+                setattr(module, name, value)
+            yield self
+        finally:
+            for module, name, value in originals:
+                setattr(module, name, value)
+
+
+class FakeTicker:
+    def __init__(self, backend, symbol):
+        self.backend = backend
+        self.symbol = symbol
+
+    @property
+    def info(self):
+        self.backend.calls['info'] += 1
+        self.backend.sleep()
+        if self.backend.error_rate and self.backend.rng.random() < self.backend.error_rate:
+            raise ConnectionError(f"Injected failure for {self.symbol}")
+        return make_info(self.symbol, np.random.default_rng(zlib.crc32(self.symbol.encode())))
+
+    def history(self, period=None, start=None, end=None, **kwargs):
+        self.backend.calls['history'] += 1
+        self.backend.sleep()
+        history = self.backend.history_for(self.symbol)
+        if start is not None:
+            history = history[history.index >= pd.Timestamp(start, tz=history.index.tz)]
+        return history
+
+    @property
+    def dividends(self):
+        dividends = self.history().loc[:, 'Dividends']
+        return dividends[dividends != 0]
+
+
+class FakeSession:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, url, *args, **kwargs):
+        return self.backend.get(url, *args, **kwargs)
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
@@ -0,0 +1,241 @@
+# ./benchmarks/run_benchmarks.py
+#
+# Offline benchmarks for the scraper, the table and the charts.
+# Run from the repository root:  python -m benchmarks.run_benchmarks --symbols 10000
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'dataGetter'))
+
+from benchmarks.synthetic import make_symbols, make_universe, make_history
+from benchmarks.fake_backend import FakeBackend
+
+
+def summarize(stage, durations, total=None, items=None):
+    durations = np.asarray(durations, dtype=float)
+    total = float(durations.sum()) if total is None else total
+    items = len(durations) if items is None else items
+    return {
+        'stage': stage,
+        'items': items,
+        'total_s': round(total, 4),
+        'throughput_per_s': round(items / total, 1) if total > 0 else None,
+        'p50_ms': round(float(np.percentile(durations, 50)) * 1000, 3) if len(durations) else None,
+        'p95_ms': round(float(np.percentile(durations, 95)) * 1000, 3) if len(durations) else None,
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = perf_counter()
+    result = fn(*args, **kwargs)
+    return perf_counter() - start, result
+
+
+def bench_scraper(args, symbols):
+    from dataGetter import StockScreener
+    backend = FakeBackend(symbols, latency=args.latency, jitter=args.jitter,
+                          error_rate=args.error_rate)
+    with backend.install():
+        screener = StockScreener(workers=args.workers, rate=args.rate, burst=args.workers,
+                                 use_async=args.use_async)
+        latencies = []
+        fetch_info = screener.fetch_info
+
+        def timed_fetch(symbol):
+            elapsed, result = timed(fetch_info, symbol)
+            latencies.append(elapsed)
+            return result
+
+        screener.fetch_info = timed_fetch
+        total, _ = timed(screener.run)
+    return summarize('scrape_async' if args.use_async else 'scrape', latencies,
+                     total=total, items=len(latencies))
+
+
+def bench_load(args, universe):
+    from fundamentals_store import FundamentalsStore
+    store = FundamentalsStore()
+    store.upsert(universe)
+    store.export_csv('bench_export.csv')
+
+    import pandas as pd
+    csv_times = [timed(pd.read_csv, 'bench_export.csv', encoding='cp1252',
+                       on_bad_lines='skip')[0] for _ in range(args.repeat)]
+    store_times = [timed(FundamentalsStore().read)[0] for _ in range(args.repeat)]
+    compact_times = [timed(FundamentalsStore().read_compact)[0] for _ in range(args.repeat)]
+    symbol_times = [timed(FundamentalsStore().symbols)[0] for _ in range(args.repeat)]
+    return [summarize('load_csv', csv_times), summarize('load_store', store_times),
+            summarize('load_compact', compact_times), summarize('load_symbols', symbol_times)]
+
+
+def bench_filter(args):
+    from table_view import TableView
+    view = TableView()
+    df = view.load_data()
+    rng = np.random.default_rng(1)
+    thresholds = [(rng.uniform(0, 30), rng.uniform(0, 6), rng.uniform(0, 5),
+                   rng.uniform(5, 40), rng.uniform(0, 3), rng.uniform(30, 100),
+                   rng.uniform(0, 2), rng.uniform(0, 8))
+                  for _ in range(args.repeat * 10)]
+    cold = [timed(view.filter_data, df, *t)[0] for t in thresholds]
+    warm = [timed(view.filter_data, df, *t)[0] for t in thresholds]
+    return [summarize('filter_cold', cold), summarize('filter_warm', warm)]
+
+
+def bench_charts(args, symbols):
+    from chart_view import ChartView
+    view = ChartView()
+    for symbol in symbols:
+        view.store.write(symbol, make_history(symbol, args.years))
+
+    reads = [timed(view.store.read, symbol)[0] for symbol in symbols]
+    windows = [timed(view.store.read, symbol, start='2020-01-01', end='2020-12-31')[0]
+               for symbol in symbols]
+    bundles = [timed(view.build_chart_bundle, symbol, 'Max')[0] for symbol in symbols]
+    compares = [timed(view.build_comparison_bundle, symbols, 'Max')[0] for _ in range(args.repeat)]
+    return [summarize('history_read', reads), summarize('history_slice', windows),
+            summarize('chart_bundle', bundles), summarize('compare_bundle', compares)]
+
+
+def bench_analytics(args, symbols):
+    import analytics
+    from history_store import HistoryStore
+    store = HistoryStore()
+    results = []
+    for processes in sorted({1, args.processes}):
+        total, _ = timed(analytics.batch_dividend_metrics, symbols, store, processes=processes)
+        results.append(summarize(f'dividend_metrics_x{processes}',
+                                 [total / max(1, len(symbols))] * len(symbols), total=total))
+    return results
+
+
+# Modules the screener table must not pull in; they belong to the Charts view.
+# (Streamlit itself imports a lazy plotly.graph_objects stub, so it is not listed.)
+CHART_MODULES = ('chart_view', 'yfinance', 'plotly.subplots', 'prefetch')
+
+# Runs the real main.py through Streamlit's AppTest against a synthetic store:
+# the first run (default thresholds) and a rerun with every threshold cleared,
+# both on the Table view, then the import of the chart stack on its own
+STARTUP_PROBE = """
+import json, sys
+from time import perf_counter
+sys.path.insert(0, %(root)r)
+from benchmarks.synthetic import make_universe
+from fundamentals_store import FundamentalsStore
+from streamlit.testing.v1 import AppTest
+FundamentalsStore().upsert(make_universe(%(symbols)d))
+at = AppTest.from_file(%(script)r, default_timeout=120)
+start = perf_counter()
+at.run()
+table = perf_counter() - start
+for threshold in at.number_input[:10]:
+    threshold.set_value(0.0)
+at.run()
+errors = [str(e.value) for e in at.exception]
+loaded = [m for m in %(modules)r if m in sys.modules]
+start = perf_counter()
+import chart_view
+charts = perf_counter() - start
+print(json.dumps({'table': table, 'charts': charts, 'loaded': loaded, 'errors': errors}))
+"""
+
+
+def bench_startup(args):
+    # Each probe is a fresh interpreter in its own directory, like a cold app process
+    table, charts = [], []
+    probe_source = STARTUP_PROBE % {'root': ROOT, 'script': os.path.join(ROOT, 'main.py'),
+                                    'symbols': min(args.symbols, 3000),
+                                    'modules': CHART_MODULES}
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as probe_dir:
+            output = subprocess.run([sys.executable, '-c', probe_source], cwd=probe_dir,
+                                    capture_output=True, text=True, check=True).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        table.append(probe['table'])
+        charts.append(probe['charts'])
+        if probe['errors']:
+            print(f"warning: main.py raised {'; '.join(probe['errors'])}", file=sys.stderr)
+        if probe['loaded']:
+            print(f"warning: the table path imports {', '.join(probe['loaded'])}",
+                  file=sys.stderr)
+    return [summarize('startup_table_run', table),
+            summarize('startup_chart_imports', charts)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks")
+    parser.add_argument('--symbols', type=int, default=10_000,
+                        help="size of the synthetic fundamentals universe")
+    parser.add_argument('--scrape-symbols', type=int, default=200,
+                        help="symbols fetched through the fake yfinance backend")
+    parser.add_argument('--chart-symbols', type=int, default=50,
+                        help="symbols with synthetic price histories")
+    parser.add_argument('--years', type=float, default=30,
+                        help="years of daily bars per history")
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="injected seconds per fake network call")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="extra uniform random latency per call")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="fraction of fake .info calls that fail")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help="token bucket rate for the scrape stage")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="scrape through the asyncio pipeline")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help="process pool size for the analytics stage")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--stages', default='startup,scrape,load,filter,charts,analytics')
+    parser.add_argument('--json', metavar='PATH', help="also write results as JSON")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    stages = set(args.stages.split(','))
+    universe = make_universe(args.symbols)
+    symbols = universe['symbol'].tolist()
+    chart_symbols = symbols[:args.chart_symbols]
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            if 'startup' in stages:
+                results.extend(bench_startup(args))
+            if 'scrape' in stages:
+                results.append(bench_scraper(args, make_symbols(args.scrape_symbols, seed=7)))
+            if 'load' in stages or 'filter' in stages:
+                os.makedirs('universe', exist_ok=True)
+                os.chdir('universe')
+                results.extend(bench_load(args, universe))
+                if 'filter' in stages:
+                    results.extend(bench_filter(args))
+                os.chdir(workdir)
+            if 'charts' in stages or 'analytics' in stages:
+                results.extend(bench_charts(args, chart_symbols))
+                if 'analytics' in stages:
+                    results.extend(bench_analytics(args, chart_symbols))
+        finally:
+            os.chdir(cwd)
+
+    columns = ['stage', 'items', 'total_s', 'throughput_per_s', 'p50_ms', 'p95_ms']
+    print(' '.join(f"{c:>16}" for c in columns))
+    for row in results:
+        print(' '.join(f"{str(row[c]):>16}" for c in columns))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
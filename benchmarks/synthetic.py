@@ -0,0 +1,85 @@
+# ./benchmarks/synthetic.py
+import string
+import zlib
+import numpy as np
+import pandas as pd
+
+TZ = 'America/New_York'
+
+
+def make_symbols(n, seed=0):
+    # Unique 1-5 letter tickers, deterministic for a seed
+    rng = np.random.default_rng(seed)
+    letters = np.array(list(string.ascii_uppercase))
+    symbols = set()
+    while len(symbols) < n:
+        length = rng.integers(1, 6)
+        symbols.add(''.join(rng.choice(letters, length)))
+    return sorted(symbols)
+
+
+def make_info(symbol, rng):
+    # A yfinance-like .info dict with plausible fundamentals
+    market_cap = float(np.exp(rng.normal(21, 2.5)))
+    return {
+        'longName': f"{symbol} Holdings Inc.",
+        'marketCap': market_cap,
+        'dividendYield': float(max(0.0, rng.normal(0.025, 0.025))),
+        'trailingPE': float(abs(rng.normal(20, 12))),
+        'debtToEquity': float(abs(rng.normal(80, 60))),
+        'payoutRatio': float(max(0.0, rng.normal(0.45, 0.3))),
+        'totalCash': market_cap * float(rng.uniform(0.01, 0.3)),
+        'freeCashflow': market_cap * float(rng.normal(0.05, 0.04)),
+        'firstTradeDateEpochUtc': int(pd.Timestamp.now().timestamp()
+                                      - rng.uniform(1, 50) * 365.25 * 86400),
+    }
+
+
+def make_universe(n, seed=0):
+    # Fundamentals table in the fundamentals store's layout
+    rng = np.random.default_rng(seed)
+    symbols = make_symbols(n, seed)
+    market_cap = np.exp(rng.normal(21, 2.5, n))
+    fcf = market_cap * rng.normal(0.05, 0.04, n)
+    return pd.DataFrame({
+        'symbol': symbols,
+        'name': [f"{s} Holdings Inc." for s in symbols],
+        'market_cap': market_cap,
+        'dividend_yield': np.clip(rng.normal(2.5, 2.5, n), 0, None),
+        'age_years': rng.uniform(0, 60, n),
+        'pe_ratio': np.abs(rng.normal(20, 12, n)),
+        'debt_to_equity': np.abs(rng.normal(80, 60, n)),
+        'payout_ratio': np.clip(rng.normal(45, 30, n), 0, None),
+        'total_cash': market_cap * rng.uniform(0.01, 0.3, n),
+        'free_cash_flow': fcf,
+        'free_cash_flow_yield': fcf / market_cap * 100,
+        'timestamp': pd.Timestamp.now() - pd.to_timedelta(rng.uniform(0, 30, n), unit='D'),
+        'div_annual': rng.uniform(0, 5, n),
+        'div_growth_5y': rng.normal(4, 6, n),
+        'div_streak_years': rng.integers(0, 50, n).astype(float),
+        'div_impact_avg': rng.normal(-0.5, 1.5, n),
+    })
+
+
+def make_history(symbol, years=20, seed=None, end=None):
+    # Daily bars shaped like Ticker.history(): geometric random walk closes,
+    # quarterly dividends and the occasional split
+    rng = np.random.default_rng(seed if seed is not None else zlib.crc32(symbol.encode()))
+    end = pd.Timestamp(end or pd.Timestamp.now(tz=TZ).normalize())
+    index = pd.bdate_range(end=end.tz_localize(None) if end.tz else end,
+                           periods=int(years * 252), tz=TZ, name='Date')
+    n = len(index)
+    close = 20 * np.exp(np.cumsum(rng.normal(0.0003, 0.018, n)))
+    open_ = close * np.exp(rng.normal(0, 0.006, n))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.008, n)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.008, n)))
+    dividends = np.zeros(n)
+    dividends[::63] = close[::63] * 0.01
+    splits = np.zeros(n)
+    if n > 2000:
+        splits[rng.integers(1000, n)] = 2.0
+    return pd.DataFrame({
+        'Open': open_, 'High': high, 'Low': low, 'Close': close,
+        'Volume': rng.integers(10_000, 5_000_000, n),
+        'Dividends': dividends, 'Stock Splits': splits,
+    }, index=index)
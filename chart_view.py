@@ -5,131 +5,152 @@ import plotly.graph_objects as go
 import plotly.subplots as sp
 import pandas as pd
 import numpy as np
-import os
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
+from history_store import HistoryStore, dividends_from
+from prefetch import prefetch_histories
+import analytics
+import metrics
+import transport
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Visible range presets (days); None is the full history
+CHART_RANGES = {'3M': 92, '1Y': 365, '5Y': 1826, '10Y': 3652, 'Max': None}
+
+# Upper bound on candles sent to the browser per chart
+MAX_CANDLES = 2000
+
+# Default number of symbols preselected in the comparison view
+COMPARE_DEFAULT = 5
+
+# Points per comparison chart across all lines; more symbols means coarser lines
+COMPARE_POINT_BUDGET = 50_000
+
+# Coarsening steps with their approximate bar length in days
+RESOLUTIONS = [('Daily', None, 365.25 / 252), ('Weekly', 'W', 7),
+               ('Monthly', 'ME', 30.44), ('Quarterly', 'QE', 91.31)]
+
+def resample_ohlc(hist, rule):
+    if rule is None:
+        return hist
+    return hist.resample(rule).agg({
+        'Open': 'first',
+        'High': 'max',
+        'Low': 'min',
+        'Close': 'last',
+        'Volume': 'sum'
+    }).dropna(subset=['Close'])
+
+def choose_resolution(span_days, max_points=MAX_CANDLES):
+    # Finest resolution whose bar count for the visible span fits the budget
+    for label, rule, bar_days in RESOLUTIONS:
+        if span_days / bar_days <= max_points:
+            return label, rule
+    return RESOLUTIONS[-1][:2]
+
 class ChartView:
     def __init__(self):
         self.cache_dir = "./chart_cache"
-        os.makedirs(self.cache_dir, exist_ok=True)
+        self.store = HistoryStore(self.cache_dir)
 
-    def _get_cache_file(self, symbol):
-        return os.path.join(self.cache_dir, f"{symbol}_data.pkl")
+    def _is_cache_valid(self, symbol):
+        return self.store.is_fresh(symbol, timedelta(days=1))
 
-    def _is_cache_valid(self, cache_file):
-        if not os.path.exists(cache_file):
-            return False
-        mod_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-        return datetime.now() - mod_time < timedelta(days=1)
-
-    def _get_stock_data(self, symbol):
-        cache_file = self._get_cache_file(symbol)
+    def _extend_history(self, stock, history):
+        # Fetch only the bars after the cache; None means a full reload is needed.
+        # The second-to-last cached bar is the anchor: it is always a complete bar,
+        # while the last one may have been cached mid-session.
+        if len(history) < 2:
+            return None
+        anchor = history.index[-2]
+        new_bars = stock.history(start=anchor.strftime('%Y-%m-%d'))
+        if new_bars.empty or anchor not in new_bars.index:
+            return None
+        
+        # Adjusted prices shift after a split or dividend, so the cached bars are stale
+        cached_close = history.loc[anchor, 'Close']
+        if not np.isclose(new_bars.loc[anchor, 'Close'], cached_close, rtol=1e-5):
+            return None
+        appended = new_bars[new_bars.index > anchor]
+        if (appended['Dividends'] != 0).any() or (appended['Stock Splits'] != 0).any():
+            return None
         
-        if self._is_cache_valid(cache_file):
+        return pd.concat([history[history.index <= anchor], appended])
+
+    def _refresh_cache(self, symbol):
+        if self._is_cache_valid(symbol):
             logger.info(f"Using cached data for {symbol}")
-            data = pd.read_pickle(cache_file)
-            return data['history'], data['dividends']
+            metrics.inc('chart_cache_requests_total', result='hit')
+            return
+        
+        stock = yf.Ticker(symbol, session=transport.get_session())
+        if self.store.exists(symbol):
+            cached = self.store.read(symbol)
+            history = self._extend_history(stock, cached)
+            if history is not None:
+                logger.info(f"Appended {len(history) - len(cached)} bars for {symbol}")
+                self.store.write(symbol, history)
+                metrics.inc('chart_cache_requests_total', result='incremental')
+                return
             
+        # Dividends come from the same history call, so one request covers both
         logger.info(f"Fetching fresh data for {symbol}")
-        stock = yf.Ticker(symbol)
-        history = stock.history(period="max")
-        dividends = stock.dividends
-        
-        data = {
-            'history': history,
-            'dividends': dividends
-        }
-        pd.to_pickle(data, cache_file)
-        
-        return history, dividends
+        with metrics.timer('chart_history_fetch_seconds'):
+            history = stock.history(period="max")
+        self.store.write(symbol, history)
+        metrics.inc('chart_cache_requests_total', result='miss')
+
+    def _get_stock_data(self, symbol):
+        self._refresh_cache(symbol)
+        history = self.store.read(symbol)
+        return history, dividends_from(history)
 
     def analyze_dividend_price_impact(self, hist, dividends):
-        if dividends.empty:
-            return None, pd.DataFrame()
-        
-        impacts = []
-        one_year_ago = pd.Timestamp.now(tz=dividends.index.tz) - pd.Timedelta(days=365)
-        recent_divs = dividends[dividends.index > one_year_ago]
-        
-        for date, amount in recent_divs.items():
-            try:
-                start_date = date - pd.Timedelta(days=1)
-                end_date = date + pd.Timedelta(days=1)
-                period_prices = hist.loc[start_date:end_date]
-                
-                if not period_prices.empty:
-                    open_price = period_prices['Open'].iloc[0]
-                    close_price = period_prices['Close'].iloc[-1]
-                    price_change = ((close_price - open_price) / open_price) * 100
-                    
-                    impacts.append({
-                        'Date': date.strftime('%Y-%m-%d'),
-                        'Open': f'${open_price:.2f}',
-                        'Close': f'${close_price:.2f}',
-                        'Dividend': f'${amount:.2f}',
-                        'Impact': f'{price_change:+.2f}%'
-                    })
-            except Exception as e:
-                logger.error(f"Error analyzing dividend impact for {date}: {e}")
-        
-        if impacts:
-            impacts_df = pd.DataFrame(impacts)
-            avg_impact = np.mean([float(x['Impact'].rstrip('%')) for x in impacts])
-            return avg_impact, impacts_df
-        
-        return None, pd.DataFrame()
+        return analytics.dividend_price_impact(hist, dividends)
 
     def analyze_dividend_history(self, dividends):
-        if dividends.empty:
-            return pd.DataFrame(), pd.DataFrame(), 0
-        
-        annual_div = dividends.resample('Y').sum()
-        div_changes = annual_div.pct_change() * 100
-        
-        current_streak = 0
-        prev_year = None
-        
-        for year in annual_div.index[::-1]:
-            if prev_year is None or year.year == prev_year - 1:
-                current_streak += 1
-                prev_year = year.year
-            else:
-                break
-                
-        return annual_div, div_changes, current_streak
+        return analytics.dividend_history(dividends)
 
-    def generate_price_chart(self, symbol):
+    def generate_price_chart(self, symbol, window='Max'):
         logger.info(f"Getting price data for {symbol}")
         
         hist, dividends = self._get_stock_data(symbol)
         if hist.empty:
             return None, hist, dividends
+        return self._price_figure(symbol, hist, window), hist, dividends
+
+    def _price_figure(self, symbol, hist, window):
+        # Only the visible range is charted, at a resolution that keeps the payload small
+        days = CHART_RANGES.get(window)
+        visible = hist if days is None else hist[hist.index >= hist.index[-1] - pd.Timedelta(days=days)]
+        span_days = (visible.index[-1] - visible.index[0]).days
+        resolution, rule = choose_resolution(span_days)
+        bars = resample_ohlc(visible, rule)
             
         fig = go.Figure(data=go.Candlestick(
-            x=hist.index,
-            open=hist['Open'],
-            high=hist['High'],
-            low=hist['Low'],
-            close=hist['Close']
+            x=bars.index,
+            open=bars['Open'],
+            high=bars['High'],
+            low=bars['Low'],
+            close=bars['Close']
         ))
         
         fig.update_layout(
-            title=f"{symbol} Price History",
+            title=f"{symbol} Price History ({resolution})",
             height=600,
             yaxis=dict(fixedrange=False)
         )
         
-        return fig, hist, dividends
+        return fig
 
-    def generate_dividend_chart(self, symbol, hist, dividends):
+    def generate_dividend_chart(self, symbol, hist, dividends, history_analysis=None):
         if dividends.empty:
             return None
             
-        annual_div, div_changes, streak = self.analyze_dividend_history(dividends)
+        annual_div, div_changes, streak = (history_analysis or
+                                           self.analyze_dividend_history(dividends))
         
         fig = sp.make_subplots(rows=2, cols=1,
                               row_heights=[0.6, 0.4],
@@ -161,31 +182,122 @@ class ChartView:
         
         return fig
 
+    def build_chart_bundle(self, symbol, window):
+        # Everything render() shows for one symbol, computed from a single read
+        hist = self.store.read(symbol)
+        if hist.empty:
+            return None
+        dividends = dividends_from(hist)
+        avg_impact, impacts_df = self.analyze_dividend_price_impact(hist, dividends)
+        history_analysis = self.analyze_dividend_history(dividends)
+        return {
+            'price_fig': self._price_figure(symbol, hist, window),
+            'avg_impact': avg_impact,
+            'impacts_df': impacts_df,
+            'div_fig': self.generate_dividend_chart(symbol, hist, dividends, history_analysis),
+            'history_analysis': history_analysis,
+        }
+
+    def build_comparison_bundle(self, symbols, window):
+        # Figures and summary for the comparison view, from one aligned close matrix
+        days = CHART_RANGES.get(window)
+        start = None if days is None else pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=days)
+        result = analytics.compare(symbols, self.store, start)
+        if result is None:
+            return None
+
+        # The math runs on every day; the browser gets a fixed point budget per chart.
+        # Dates are formatted once and shared, Plotly validates strings far faster
+        per_line = max(250, min(MAX_CANDLES, COMPARE_POINT_BUDGET // len(symbols)))
+        step = max(1, -(-len(result['performance']) // per_line))
+        x = result['performance'].index[::step].strftime('%Y-%m-%d').to_numpy()
+        figures = {}
+        titles = {
+            'performance': "Performance (%)",
+            'drawdown': "Drawdown from Peak (%)",
+            'volatility': f"Rolling {analytics.VOLATILITY_WINDOW}-Day Volatility (%, annualized)",
+        }
+        for key, title in titles.items():
+            values = result[key].to_numpy()[::step]
+            fig = go.Figure([go.Scattergl(x=x, y=values[:, j], mode='lines', name=symbol)
+                             for j, symbol in enumerate(symbols)])
+            fig.update_layout(title=title, height=450, hovermode='x unified')
+            figures[key] = fig
+
+        corr = result['correlation']
+        corr_fig = go.Figure(go.Heatmap(z=corr.to_numpy(), x=corr.columns, y=corr.index,
+                                        zmin=-1, zmax=1, colorscale='RdBu'))
+        corr_fig.update_layout(title="Correlation of Daily Returns",
+                               height=max(400, 18 * len(corr)))
+        return {'figures': figures, 'corr_fig': corr_fig, 'summary': result['summary']}
+
+    def render_comparison(self, options):
+        symbols = st.multiselect("Compare", options, default=options[:COMPARE_DEFAULT],
+                                 key='compare_symbols')
+        if not symbols:
+            st.write("Select symbols to compare")
+            return
+        window = st.radio("Range", list(CHART_RANGES), index=1, horizontal=True,
+                          key='compare_range')
+
+        # Stale or missing histories come down in bulk rather than one call each
+        prefetch_histories(symbols, self.store)
+        symbols = [symbol for symbol in symbols if self.store.exists(symbol)]
+        if not symbols:
+            st.write("No price history available for the selected symbols")
+            return
+        versions = tuple(self.store.version(symbol) for symbol in symbols)
+        bundle = _comparison_bundle(self, tuple(symbols), versions, window)
+        if bundle is None:
+            st.write("No prices in the selected range")
+            return
+
+        st.dataframe(bundle['summary'], column_config={
+            column: st.column_config.NumberColumn(format="%.1f")
+            for column in bundle['summary'].columns})
+        for key in ('performance', 'drawdown', 'volatility'):
+            st.plotly_chart(bundle['figures'][key], use_container_width=True)
+        st.plotly_chart(bundle['corr_fig'], use_container_width=True)
+
     def render(self):
         if 'selected_symbol' not in st.session_state:
             st.write("Select a stock from the table to view charts")
             return
             
         symbol = st.session_state['selected_symbol']
-        price_fig, hist, dividends = self.generate_price_chart(symbol)
+        # Narrower ranges switch the candles to finer bars
+        window = st.radio("Range", list(CHART_RANGES), index=len(CHART_RANGES) - 1,
+                          horizontal=True, key='chart_range')
+        self._refresh_cache(symbol)
+        bundle = _chart_bundle(self, symbol, self.store.version(symbol), window)
         
-        if price_fig:
-            st.plotly_chart(price_fig, use_container_width=True)
+        if bundle:
+            st.plotly_chart(bundle['price_fig'], use_container_width=True)
             
-            avg_impact, impacts_df = self.analyze_dividend_price_impact(hist, dividends)
+            avg_impact, impacts_df = bundle['avg_impact'], bundle['impacts_df']
             if not impacts_df.empty:
                 st.write("### Dividend Price Impact Analysis (Last 12 Months)")
                 col1, col2 = st.columns([0.7, 0.3])
                 with col1:
-                    st.dataframe(impacts_df, hide_index=True)
+                    st.dataframe(
+                        impacts_df,
+                        hide_index=True,
+                        column_config={
+                            'Date': st.column_config.DateColumn(format="YYYY-MM-DD"),
+                            'Open': st.column_config.NumberColumn(format="$%.2f"),
+                            'Close': st.column_config.NumberColumn(format="$%.2f"),
+                            'Dividend': st.column_config.NumberColumn(format="$%.2f"),
+                            'Impact': st.column_config.NumberColumn(format="%+.2f%%"),
+                        }
+                    )
                 with col2:
                     st.metric("12-Month Average Price Impact", f"{avg_impact:+.2f}%")
             
-            div_fig = self.generate_dividend_chart(symbol, hist, dividends)
+            div_fig = bundle['div_fig']
             if div_fig:
                 st.plotly_chart(div_fig, use_container_width=True)
                 
-                annual_div, div_changes, streak = self.analyze_dividend_history(dividends)
+                annual_div, div_changes, streak = bundle['history_analysis']
                 if not annual_div.empty:
                     col1, col2, col3 = st.columns(3)
                     with col1:
@@ -195,4 +307,15 @@ class ChartView:
                         st.metric("5-Year Average Growth",
                                 f"{div_changes.tail(5).mean():.1f}%")
                     with col3:
-                        st.metric("Consecutive Payment Years", streak)
\ No newline at end of file
+                        st.metric("Consecutive Payment Years", streak)
+
+@st.cache_resource(max_entries=32)
+def _chart_bundle(_view, symbol, cache_version, window):
+    # Shared across sessions; cache_version (the history file's mtime) changes
+    # whenever the cache is refreshed, so stale bundles are never served
+    return _view.build_chart_bundle(symbol, window)
+
+@st.cache_resource(max_entries=16)
+def _comparison_bundle(_view, symbols, cache_versions, window):
+    # Keyed like _chart_bundle, with one file version per symbol
+    return _view.build_comparison_bundle(list(symbols), window)
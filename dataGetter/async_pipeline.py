@@ -0,0 +1,107 @@
+# dataGetter/async_pipeline.py
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from write_behind import FlushError
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class AsyncIngestionPipeline:
+    # source -> fetch -> parse -> write, connected by bounded queues.
+    #
+    # The fetch stage runs `fetch_workers` coroutines that share the screener's
+    # token bucket and its pooled keep-alive session; yfinance is blocking, so
+    # each fetch runs on a dedicated thread pool of the same size. Full queues
+    # block the stage upstream, so memory stays bounded by the queue sizes.
+    # All stages run in one TaskGroup: if any stage fails, the others are
+    # cancelled instead of waiting forever on a queue nobody drains.
+
+    def __init__(self, screener, fetch_workers=8, queue_size=64):
+        self.screener = screener
+        self.fetch_workers = max(1, fetch_workers)
+        self.queue_size = queue_size
+        self.done_count = 0
+
+    async def _source(self, symbols, fetch_queue, deadline):
+        for symbol in symbols:
+            if deadline is not None and monotonic() >= deadline:
+                logger.info("Time budget exhausted; not starting more symbols")
+                break
+            await fetch_queue.put(symbol)
+        for _ in range(self.fetch_workers):
+            await fetch_queue.put(_DONE)
+
+    async def _fetch(self, fetch_queue, parse_queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            symbol = await fetch_queue.get()
+            if symbol is _DONE:
+                return
+            await self.screener.limiter.acquire_async()
+            try:
+                info = await loop.run_in_executor(self._executor, self.screener.fetch_info, symbol)
+            except Exception as e:
+                self.screener.record_error(symbol, e)
+                continue
+            await parse_queue.put((symbol, info))
+
+    async def _parse(self, parse_queue, write_queue):
+        while True:
+            item = await parse_queue.get()
+            if item is _DONE:
+                await write_queue.put(_DONE)
+                return
+            symbol, info = item
+            try:
+                row = self.screener.parse_info(symbol, info)
+            except Exception as e:
+                self.screener.record_error(symbol, e)
+                continue
+            await write_queue.put(row)
+
+    async def _write(self, write_queue, total):
+        loop = asyncio.get_running_loop()
+        while True:
+            row = await write_queue.get()
+            if row is _DONE:
+                return
+            # A batch flush does file I/O, so keep it off the event loop. A failed
+            # flush ends the stage (and the pipeline); anything else is this row's
+            try:
+                await loop.run_in_executor(None, self.screener.save, row)
+            except FlushError:
+                raise
+            except Exception as e:
+                self.screener.record_error(row['symbol'], e)
+                continue
+            self.done_count += 1
+            logger.info(f"Processed {self.done_count}/{total}: {row['symbol']}")
+
+    async def _close_fetch_stage(self, fetchers, parse_queue):
+        await asyncio.gather(*fetchers)
+        await parse_queue.put(_DONE)
+
+    async def run(self, symbols, deadline=None):
+        fetch_queue = asyncio.Queue(self.queue_size)
+        parse_queue = asyncio.Queue(self.queue_size)
+        write_queue = asyncio.Queue(self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.fetch_workers,
+                                            thread_name_prefix='fetch')
+        try:
+            async with asyncio.TaskGroup() as stages:
+                stages.create_task(self._source(symbols, fetch_queue, deadline))
+                fetchers = [stages.create_task(self._fetch(fetch_queue, parse_queue))
+                            for _ in range(self.fetch_workers)]
+                stages.create_task(self._close_fetch_stage(fetchers, parse_queue))
+                stages.create_task(self._parse(parse_queue, write_queue))
+                stages.create_task(self._write(write_queue, len(symbols)))
+        except ExceptionGroup as group:
+            # Callers handle the failure of the stage that brought the pipeline down
+            raise group.exceptions[0]
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
@@ -1,109 +1,309 @@
 # dataGetter/dataGetter.py
 
-import requests
 import pandas as pd
 import yfinance as yf
-from datetime import datetime
+from datetime import datetime, timedelta
+from time import monotonic
 import logging
-import csv
 import os
-from time import sleep
+import sys
+import argparse
+import asyncio
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# The fundamentals store and metrics live at the repository root, shared with the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fundamentals_store import FundamentalsStore, FIELDNAMES
+import metrics
+import transport
+from rate_limiter import TokenBucket
+from write_behind import WriteBehindSink, FlushError
+from async_pipeline import AsyncIngestionPipeline
+from universe import Universe
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+UNIVERSE_MAX_AGE = timedelta(days=1)
+MAX_RETIRE_FRACTION = 0.1
+
 class StockScreener:
-    def __init__(self):
-        self.output_file = 'all_stocks.csv'
-        self.fieldnames = [
-            'symbol', 'name', 'market_cap', 'dividend_yield', 'age_years',
-            'pe_ratio', 'debt_to_equity', 'payout_ratio', 'total_cash',
-            'free_cash_flow', 'free_cash_flow_yield', 'timestamp'
-        ]
+    def __init__(self, workers=1, rate=1.0, burst=None, batch_size=50, flush_interval=5.0,
+                 use_async=False, queue_size=64):
+        self.store = FundamentalsStore()
+        self.universe = Universe()
+        self.workers = max(1, workers)
+        self.use_async = use_async
+        self.queue_size = queue_size
+        # Shared by the symbol list and every yfinance call; records or replays per FINANCE_HTTP_MODE
+        self.session = transport.get_session(pool_size=max(10, self.workers))
+        # One token per symbol; shared by every worker so the request budget is global
+        self.limiter = TokenBucket(rate, burst)
+        self._stop = threading.Event()
+        self.fieldnames = FIELDNAMES
         self.processed_symbols = set()
-        self._initialize_file()
+        self._processed_lock = threading.Lock()
+        # Replays any batch left in the journal by a crash
+        self.sink = WriteBehindSink(self.store, batch_size=batch_size,
+                                    flush_interval=flush_interval, on_flush=self._on_flush)
         self._load_processed_symbols()
 
-    def _initialize_file(self):
-        if not os.path.exists(self.output_file):
-            with open(self.output_file, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
-                writer.writeheader()
-
     def _load_processed_symbols(self):
-        if os.path.exists(self.output_file):
-            with open(self.output_file, 'r') as f:
-                reader = csv.DictReader(f)
-                self.processed_symbols = {row['symbol'] for row in reader}
+        if self.store.exists():
+            self.processed_symbols = self.store.symbols()
             logger.info(f"Loaded {len(self.processed_symbols)} processed symbols")
 
-    def get_symbols(self):
-        url = 'https://api.nasdaq.com/api/screener/stocks'
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        params = {'download': 'true'}
-        
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            data = response.json()
-            all_symbols = [row['symbol'] for row in data['data']['rows']]
-            return [s for s in all_symbols if s not in self.processed_symbols]
-        except Exception as e:
-            logger.error(f"Symbol fetch error: {e}")
+    def _listed(self):
+        # Latest universe snapshot with delisted rows retired from the store; the
+        # snapshot is only re-downloaded once it is a day old
+        age = self.universe.latest_age()
+        if age is None or age > UNIVERSE_MAX_AGE:
+            try:
+                with metrics.timer('scraper_symbol_list_seconds'):
+                    self.universe.refresh()
+            except Exception as e:
+                logger.error(f"Symbol fetch error: {e}")
+        listed = self.universe.latest()
+        if listed is not None:
+            self._retire_delisted(set(listed['symbol']))
+        return listed
+
+    def get_symbols(self, max_age_days=None):
+        # New listings plus rows due for refresh, read from the shared universe snapshot
+        listed = self._listed()
+        if listed is None:
             return []
 
+        listed_symbols = set(listed['symbol'])
+        new = [s for s in listed['symbol'] if s not in self.processed_symbols]
+        due = []
+        if max_age_days is not None:
+            due = [s for s in self.stale_symbols(max_age_days) if s in listed_symbols]
+        logger.info(f"{len(new)} new symbols, {len(due)} due for refresh")
+        return new + due
+
+    def _retire_delisted(self, listed_symbols):
+        delisted = self.processed_symbols - listed_symbols
+        if not delisted:
+            return
+        # A truncated listing would otherwise retire most of the table
+        if len(delisted) > MAX_RETIRE_FRACTION * len(self.processed_symbols):
+            logger.warning(f"{len(delisted)} stored symbols missing from the listing; "
+                           f"not retiring them")
+            return
+        self.store.retire(delisted)
+        with self._processed_lock:
+            self.processed_symbols -= delisted
+
+    def fetch_info(self, symbol):
+        stock = yf.Ticker(symbol, session=self.session)
+        with metrics.timer('scraper_fetch_seconds'):
+            return stock.info
+
+    def parse_info(self, symbol, info):
+        stock_data = {
+            'symbol': symbol,
+            'name': info.get('longName', ''),
+            'market_cap': info.get('marketCap', 0),
+            'dividend_yield': info.get('dividendYield', 0) * 100 if info.get('dividendYield') else 0,
+            'age_years': 0,
+            'pe_ratio': info.get('trailingPE', 0),
+            'debt_to_equity': info.get('debtToEquity', 0),
+            'payout_ratio': info.get('payoutRatio', 0) * 100 if info.get('payoutRatio') else 0,
+            'total_cash': info.get('totalCash', 0),
+            'free_cash_flow': info.get('freeCashflow', 0),
+            'free_cash_flow_yield': 0,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        # Calculate free cash flow yield if market cap is available
+        if stock_data['market_cap'] and stock_data['free_cash_flow']:
+            stock_data['free_cash_flow_yield'] = (stock_data['free_cash_flow'] / stock_data['market_cap']) * 100
+        
+        if 'firstTradeDateEpochUtc' in info:
+            first_trade = pd.to_datetime(info['firstTradeDateEpochUtc'], unit='s')
+            stock_data['age_years'] = (datetime.now() - first_trade).days / 365.25
+        
+        return stock_data
+
+    def save(self, stock_data):
+        # Raises FlushError when this write triggers a batch that cannot be stored
+        self.sink.write(stock_data)
+        logger.info(f"Queued {stock_data['symbol']}")
+
+    def _on_flush(self, rows):
+        # A symbol counts as processed only once its batch is in the store
+        with self._processed_lock:
+            self.processed_symbols.update(row['symbol'] for row in rows)
+        metrics.inc('scraper_symbols_total', len(rows), status='saved')
+
+    def record_error(self, symbol, e):
+        logger.error(f"Error processing {symbol}: {e}")
+        metrics.inc('scraper_symbols_total', status='error')
+        metrics.inc('scraper_fetch_errors_total', error=type(e).__name__)
+
     def process_stock(self, symbol):
         try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
-            
-            stock_data = {
-                'symbol': symbol,
-                'name': info.get('longName', ''),
-                'market_cap': info.get('marketCap', 0),
-                'dividend_yield': info.get('dividendYield', 0) * 100 if info.get('dividendYield') else 0,
-                'age_years': 0,
-                'pe_ratio': info.get('trailingPE', 0),
-                'debt_to_equity': info.get('debtToEquity', 0),
-                'payout_ratio': info.get('payoutRatio', 0) * 100 if info.get('payoutRatio') else 0,
-                'total_cash': info.get('totalCash', 0),
-                'free_cash_flow': info.get('freeCashflow', 0),
-                'free_cash_flow_yield': 0,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            # Calculate free cash flow yield if market cap is available
-            if stock_data['market_cap'] and stock_data['free_cash_flow']:
-                stock_data['free_cash_flow_yield'] = (stock_data['free_cash_flow'] / stock_data['market_cap']) * 100
-            
-            if 'firstTradeDateEpochUtc' in info:
-                first_trade = pd.to_datetime(info['firstTradeDateEpochUtc'], unit='s')
-                stock_data['age_years'] = (datetime.now() - first_trade).days / 365.25
-
-            with open(self.output_file, 'a', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
-                writer.writerow(stock_data)
-                f.flush()
-                os.fsync(f.fileno())
-            
-            self.processed_symbols.add(symbol)
-            logger.info(f"Saved {symbol}")
-            return True
-            
+            row = self.parse_info(symbol, self.fetch_info(symbol))
         except Exception as e:
-            logger.error(f"Error processing {symbol}: {e}")
+            self.record_error(symbol, e)
             return False
+        # A failed flush is not this symbol's fault; it goes to the run loop
+        self.save(row)
+        return True
 
-    def run(self):
-        remaining_symbols = self.get_symbols()
-        logger.info(f"Processing {len(remaining_symbols)} remaining symbols")
-        
+    def _worker(self, symbol):
+        with metrics.timer('scraper_rate_limit_wait_seconds'):
+            acquired = self.limiter.acquire(stop_event=self._stop)
+        if not acquired:
+            return None
+        return self.process_stock(symbol)
+
+    def stale_symbols(self, max_age_days, limit=None):
+        # Priority queue of the stalest rows; rows without a timestamp come first
+        if not self.store.exists():
+            return []
+        table = self.store.read(columns=['symbol', 'timestamp'])
+        cutoff = pd.Timestamp(datetime.now() - timedelta(days=max_age_days))
+        stale = table[table['timestamp'].isna() | (table['timestamp'] < cutoff)]
+        heap = [(ts.value if pd.notna(ts) else -1, symbol)
+                for symbol, ts in zip(stale['symbol'], stale['timestamp'])]
+        if limit is not None:
+            return [symbol for _, symbol in heapq.nsmallest(limit, heap)]
+        heapq.heapify(heap)
+        return [heapq.heappop(heap)[1] for _ in range(len(heap))]
+
+    def _process_symbols_async(self, symbols_to_process, deadline=None):
+        logger.info(f"Processing {len(symbols_to_process)} symbols through the async pipeline "
+                    f"with {self.workers} fetchers at {self.limiter.rate:g} requests/s")
+        pipeline = AsyncIngestionPipeline(self, fetch_workers=self.workers,
+                                          queue_size=self.queue_size)
         try:
-            for i, symbol in enumerate(remaining_symbols, 1):
-                logger.info(f"Processing {i}/{len(remaining_symbols)}: {symbol}")
-                self.process_stock(symbol)
-                sleep(1)
+            asyncio.run(pipeline.run(symbols_to_process, deadline))
         except KeyboardInterrupt:
             logger.info("Program interrupted. Progress saved.")
+        except FlushError as e:
+            logger.error(f"{e}; stopping. Journaled rows are replayed on the next run")
+            raise
+        finally:
+            self.sink.close()
+
+    def _process_symbols(self, symbols_to_process, deadline=None):
+        if self.use_async:
+            return self._process_symbols_async(symbols_to_process, deadline)
+        total = len(symbols_to_process)
+        logger.info(f"Processing {total} symbols with {self.workers} workers "
+                    f"at {self.limiter.rate:g} requests/s")
+        
+        self._stop.clear()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        symbols = iter(symbols_to_process)
+        pending = {}
+        done_count = 0
+        try:
+            # Keep only a small window in flight so Ctrl-C leaves little queued work behind
+            while True:
+                while len(pending) < self.workers * 2:
+                    if deadline is not None and monotonic() >= deadline:
+                        logger.info("Time budget exhausted; not starting more symbols")
+                        break
+                    symbol = next(symbols, None)
+                    if symbol is None:
+                        break
+                    pending[executor.submit(self._worker, symbol)] = symbol
+                if not pending:
+                    break
+                done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    symbol = pending.pop(future)
+                    future.result()
+                    done_count += 1
+                    logger.info(f"Processed {done_count}/{total}: {symbol}")
+        except KeyboardInterrupt:
+            logger.info("Program interrupted. Finishing in-flight symbols...")
+            self._stop.set()
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self.sink.close()
+            logger.info("Progress saved.")
+            return
+        except FlushError as e:
+            # The store cannot be written; stop instead of fetching more rows that
+            # would only pile up in memory. The journal keeps the failed batch
+            logger.error(f"{e}; stopping. Journaled rows are replayed on the next run")
+            self._stop.set()
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            raise
+        executor.shutdown(wait=True)
+        self.sink.close()
+
+    def run(self, max_age_days=None):
+        self._process_symbols(self.get_symbols(max_age_days))
+
+    def refresh(self, max_age_days, limit=None, time_budget=None):
+        # Re-fetch only rows older than max_age_days, stalest first; the store
+        # upserts by symbol so refreshed rows replace the old ones in place.
+        # Symbols no longer listed are skipped (and retired when they can be)
+        listed = self._listed()
+        if listed is None:
+            logger.warning("No universe snapshot; refreshing stale rows unchecked")
+            stale = self.stale_symbols(max_age_days, limit)
+        else:
+            listed_symbols = set(listed['symbol'])
+            stale = [s for s in self.stale_symbols(max_age_days) if s in listed_symbols][:limit]
+        logger.info(f"Refreshing {len(stale)} rows older than {max_age_days:g} days")
+        deadline = monotonic() + time_budget if time_budget else None
+        self._process_symbols(stale, deadline)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fetch fundamentals for all listed stocks")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of concurrent fetch workers")
+    parser.add_argument('--rate', type=float, default=1.0,
+                        help="global request budget in symbols per second")
+    parser.add_argument('--burst', type=float, default=None,
+                        help="token bucket capacity (defaults to the rate)")
+    parser.add_argument('--batch-size', type=int, default=50,
+                        help="rows buffered before they are flushed to disk")
+    parser.add_argument('--flush-interval', type=float, default=5.0,
+                        help="seconds between time-based flushes")
+    parser.add_argument('--export-csv', metavar='PATH', nargs='?', const='all_stocks.csv',
+                        help="write the fundamentals table to CSV after the run")
+    parser.add_argument('--refresh', action='store_true',
+                        help="re-fetch stale rows instead of fetching new symbols")
+    parser.add_argument('--max-age-days', type=float, default=None,
+                        help="rows older than this are due for refresh (7 with --refresh; "
+                             "also re-fetched by a normal run when given)")
+    parser.add_argument('--limit', type=int, default=None,
+                        help="maximum number of rows to refresh (request budget)")
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help="stop starting new refreshes after this many seconds")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="use the asyncio source/fetch/parse/write pipeline")
+    parser.add_argument('--queue-size', type=int, default=64,
+                        help="bound on each pipeline queue (async mode)")
+    parser.add_argument('--metrics', metavar='PATH', nargs='?', const='scraper_metrics.prom',
+                        help="collect timings and write them here (.prom or .json)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    StockScreener().run()
\ No newline at end of file
+    args = parse_args()
+    if args.metrics:
+        metrics.enable()
+    screener = StockScreener(workers=args.workers, rate=args.rate, burst=args.burst,
+                             batch_size=args.batch_size, flush_interval=args.flush_interval,
+                             use_async=args.use_async, queue_size=args.queue_size)
+    if args.refresh:
+        max_age_days = args.max_age_days if args.max_age_days is not None else 7.0
+        screener.refresh(max_age_days, limit=args.limit, time_budget=args.time_budget)
+    else:
+        screener.run(args.max_age_days)
+    if args.export_csv:
+        screener.store.export_csv(args.export_csv)
+    if args.metrics:
+        metrics.write(args.metrics)
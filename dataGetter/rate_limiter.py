@@ -0,0 +1,48 @@
+# dataGetter/rate_limiter.py
+
+import asyncio
+import threading
+from time import monotonic, sleep
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens=1):
+        # Returns 0 when the tokens were taken, otherwise the seconds to wait
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, stop_event=None):
+        # Blocks until the tokens are available; returns False if stop_event fires first
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if stop_event is None:
+                sleep(wait)
+            elif stop_event.wait(wait):
+                return False
+
+    async def acquire_async(self, tokens=1):
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
@@ -0,0 +1,117 @@
+# dataGetter/write_behind.py
+
+import json
+import logging
+import os
+import threading
+from time import monotonic
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class FlushError(Exception):
+    # A batch could not be written to the store; its rows are still buffered
+    # and journaled
+    pass
+
+
+class WriteBehindSink:
+    # Buffers rows in memory and upserts them into the fundamentals store in batches.
+    #
+    # Every batch is first appended to a journal, which is truncated only once the
+    # store has been rewritten. If the process dies or the upsert fails, the next
+    # start replays every committed batch still in the journal; upserts are keyed
+    # by symbol so replaying a batch twice is harmless. A failed flush leaves its
+    # rows in the buffer and raises FlushError. At most the rows still buffered in
+    # memory and not yet journaled are lost.
+
+    def __init__(self, store, batch_size=50, flush_interval=5.0, on_flush=None):
+        self.store = store
+        self.journal_file = store.path + '.journal'
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Called with the rows of every batch that reached the store
+        self.on_flush = on_flush
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = monotonic()
+        self._closed = threading.Event()
+        self.recover()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def recover(self):
+        if not os.path.exists(self.journal_file):
+            return
+        rows = []
+        batch = []
+        with open(self.journal_file, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if 'row' in entry:
+                    batch.append(entry['row'])
+                elif entry.get('commit'):
+                    rows.extend(batch)
+                    batch = []
+        # A trailing batch without its commit marker was cut short mid-write
+        if rows:
+            self.store.upsert(rows)
+            logger.info(f"Recovered {len(rows)} rows from {self.journal_file}")
+        os.remove(self.journal_file)
+
+    def _append_journal(self, rows):
+        with open(self.journal_file, 'a') as f:
+            for row in rows:
+                f.write(json.dumps({'row': row}) + '\n')
+            f.write(json.dumps({'commit': True}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write(self, row):
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = monotonic()
+        if not self._buffer:
+            return
+        rows = list(self._buffer)
+        try:
+            with metrics.timer('scraper_flush_seconds'):
+                self._append_journal(rows)
+                self.store.upsert(rows)
+        except Exception as e:
+            metrics.inc('scraper_flush_errors_total')
+            raise FlushError(f"Flushing {len(rows)} rows to {self.store.path} failed: {e}") from e
+        # Only now are the rows safe in the store
+        del self._buffer[:len(rows)]
+        os.remove(self.journal_file)
+        metrics.inc('scraper_rows_flushed_total', len(rows))
+        logger.info(f"Flushed {len(rows)} rows to {self.store.path}")
+        if self.on_flush is not None:
+            self.on_flush(rows)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(min(1.0, self.flush_interval)):
+            with self._lock:
+                if monotonic() - self._last_flush >= self.flush_interval:
+                    try:
+                        self._flush_locked()
+                    except FlushError as e:
+                        # The rows stay buffered; the next write or close retries
+                        logger.error(str(e))
+
+    def close(self):
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
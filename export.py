@@ -0,0 +1,64 @@
+# ./export.py
+#
+# Streams Arrow tables to CSV or Parquet in record batches, so only one batch
+# is being encoded at a time on top of the source table and the output.
+import io
+import sys
+import logging
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# format -> (mime type, file extension)
+EXPORT_FORMATS = {
+    'CSV': ('text/csv', '.csv'),
+    'Parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+
+BATCH_SIZE = 10_000
+
+
+def write_table(table, sink, fmt='CSV', batch_size=BATCH_SIZE):
+    # sink: a path or a writable binary file object
+    if fmt == 'CSV':
+        with pa_csv.CSVWriter(sink, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=batch_size):
+                writer.write_batch(batch)
+    elif fmt == 'Parquet':
+        with pq.ParquetWriter(sink, table.schema, compression='zstd') as writer:
+            for batch in table.to_batches(max_chunksize=batch_size):
+                writer.write_batch(batch)
+    else:
+        raise ValueError(f"Unsupported export format {fmt}")
+
+
+def encode(table, fmt='CSV', batch_size=BATCH_SIZE):
+    sink = io.BytesIO()
+    write_table(table, sink, fmt, batch_size)
+    return sink.getvalue()
+
+
+def matches_table(store, rows, data_version, extra=None):
+    # Arrow table of the matched rows with every stored column. rows are the
+    # positions of the matches in the store file (the index of a frame from
+    # TableView.load_data); taken straight from the memory-mapped file when it
+    # has not been rewritten since, otherwise None
+    if store.version() != data_version:
+        return None
+    table = store.read_table().take(pa.array(rows, type=pa.int64()))
+    for name, values in (extra or {}).items():
+        table = table.append_column(name, pa.array(values))
+    return table
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    if len(sys.argv) < 3 or sys.argv[1] not in ('csv', 'parquet'):
+        print("usage: python export.py csv|parquet PATH")
+        sys.exit(1)
+    from fundamentals_store import FundamentalsStore
+    table = FundamentalsStore().read_table()
+    write_table(table, sys.argv[2], 'CSV' if sys.argv[1] == 'csv' else 'Parquet')
+    logger.info(f"Exported {table.num_rows} rows to {sys.argv[2]}")
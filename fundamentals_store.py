@@ -0,0 +1,237 @@
+# ./fundamentals_store.py
+import os
+import sys
+import logging
+import threading
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = pa.schema([
+    ('symbol', pa.string()),
+    ('name', pa.string()),
+    ('market_cap', pa.float64()),
+    ('dividend_yield', pa.float64()),
+    ('age_years', pa.float64()),
+    ('pe_ratio', pa.float64()),
+    ('debt_to_equity', pa.float64()),
+    ('payout_ratio', pa.float64()),
+    ('total_cash', pa.float64()),
+    ('free_cash_flow', pa.float64()),
+    ('free_cash_flow_yield', pa.float64()),
+    ('timestamp', pa.timestamp('us')),
+    # Dividend metrics precomputed from the history cache by analytics.py
+    ('div_annual', pa.float64()),
+    ('div_growth_5y', pa.float64()),
+    ('div_streak_years', pa.float64()),
+    ('div_impact_avg', pa.float64()),
+])
+
+FIELDNAMES = SCHEMA.names
+
+# Dollar amounts in the trillions lose whole dollars in float32; everything
+# else (ratios, yields, ages, per-share amounts) fits its 7 significant digits
+WIDE_FLOATS = {'market_cap', 'total_cash', 'free_cash_flow'}
+
+
+@contextmanager
+def _file_lock(path):
+    # Exclusive lock on a side file, held across processes (the scraper and
+    # analytics.update_fundamentals both rewrite the store)
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FundamentalsStore:
+    # Fundamentals table kept as an uncompressed Arrow IPC (Feather v2) file so
+    # reads can memory-map it and decode only the requested columns.
+
+    def __init__(self, path='all_stocks.arrow', csv_file='all_stocks.csv'):
+        self.path = path
+        self.csv_file = csv_file
+        self._lock = threading.Lock()
+        if not os.path.exists(self.path) and os.path.exists(self.csv_file):
+            self.import_csv(self.csv_file)
+
+    @contextmanager
+    def _locked(self):
+        # Read-merge-write sections: one thread of this process and one process at a time
+        with self._lock, _file_lock(self.path + '.lock'):
+            yield
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def version(self):
+        # Changes whenever the file is rewritten; cheap to use as a cache key
+        return os.stat(self.path).st_mtime_ns if self.exists() else 0
+
+    def read_table(self, columns=None):
+        columns = columns or FIELDNAMES
+        if not self.exists():
+            return SCHEMA.empty_table().select(columns)
+        # Files written before a column was added get it back as nulls
+        with pa.memory_map(self.path) as source:
+            stored = pa.ipc.open_file(source).schema.names
+        table = feather.read_table(self.path, memory_map=True,
+                                   columns=[c for c in columns if c in stored])
+        for name in columns:
+            if name not in stored:
+                table = table.append_column(SCHEMA.field(name),
+                                            pa.nulls(table.num_rows, SCHEMA.field(name).type))
+        return table.select(columns)
+
+    def read(self, columns=None):
+        return self.read_table(columns).to_pandas()
+
+    def read_compact(self, columns=None):
+        # Arrow-backed strings and float32 where precision allows; timestamps
+        # are already datetime64. Roughly halves the frame against read()
+        table = self.read_table(columns)
+        df = table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+        for field in table.schema:
+            if pa.types.is_floating(field.type) and field.name not in WIDE_FLOATS:
+                df[field.name] = df[field.name].astype('float32')
+        return df
+
+    def symbols(self):
+        return set(self.read_table(['symbol']).column('symbol').to_pylist())
+
+    def _normalize(self, df):
+        # Coerce whichever schema columns are present to their stored types
+        for field in SCHEMA:
+            if field.name not in df.columns:
+                continue
+            if pa.types.is_floating(field.type):
+                df[field.name] = pd.to_numeric(df[field.name], errors='coerce')
+            elif pa.types.is_timestamp(field.type):
+                df[field.name] = pd.to_datetime(df[field.name], errors='coerce',
+                                                format='ISO8601').astype('datetime64[us]')
+        return df
+
+    def _to_table(self, df):
+        df = self._normalize(df.reindex(columns=FIELDNAMES))
+        return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+    def _write(self, table):
+        tmp_path = self.path + '.tmp'
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, self.path)
+
+    def _merge(self, existing, new):
+        new = self._normalize(new).drop_duplicates('symbol', keep='last').set_index('symbol')
+        overlap = new.index.intersection(existing.index)
+        columns = [c for c in new.columns if c in existing.columns]
+        existing.loc[overlap, columns] = new.loc[overlap, columns]
+        added = new.loc[new.index.difference(existing.index)]
+        if not added.empty:
+            existing = pd.concat([existing, added])
+        return existing, len(overlap), len(added)
+
+    def upsert(self, rows):
+        # Rows for known symbols are updated in place (only the columns they carry),
+        # unknown symbols are appended
+        if isinstance(rows, pd.DataFrame):
+            groups = [rows]
+        else:
+            by_keys = {}
+            for row in rows:
+                by_keys.setdefault(tuple(row), []).append(row)
+            groups = [pd.DataFrame(group) for group in by_keys.values()]
+        if not groups or all(group.empty for group in groups):
+            return
+        with self._locked():
+            existing = self.read().set_index('symbol')
+            existing = existing[~existing.index.duplicated(keep='last')]
+            updated = added = 0
+            for group in groups:
+                existing, n_updated, n_added = self._merge(existing, group)
+                updated += n_updated
+                added += n_added
+            self._write(self._to_table(existing.reset_index()))
+        logger.info(f"Upserted {updated} updated and {added} new rows into {self.path}")
+
+    @property
+    def retired_path(self):
+        root, ext = os.path.splitext(self.path)
+        return f"{root}_retired{ext}"
+
+    def retire(self, symbols):
+        # Move rows for delisted symbols into a side file so they stop being
+        # screened and refreshed; a relisted symbol is simply fetched again
+        symbols = set(symbols)
+        if not symbols or not self.exists():
+            return 0
+        with self._locked():
+            existing = self.read()
+            mask = existing['symbol'].isin(symbols)
+            if not mask.any():
+                return 0
+            retired = existing[mask]
+            if os.path.exists(self.retired_path):
+                previous = feather.read_table(self.retired_path).to_pandas()
+                previous = previous[~previous['symbol'].isin(retired['symbol'])]
+                retired = pd.concat([previous, retired], ignore_index=True)
+            tmp_path = self.retired_path + '.tmp'
+            feather.write_feather(self._to_table(retired), tmp_path, compression='uncompressed')
+            os.replace(tmp_path, self.retired_path)
+            self._write(self._to_table(existing[~mask]))
+        logger.info(f"Retired {int(mask.sum())} delisted rows into {self.retired_path}")
+        return int(mask.sum())
+
+    def import_csv(self, csv_file):
+        # No NA parsing: "NA" is a ticker. Empty numeric cells become NaN in _normalize
+        df = pd.read_csv(csv_file,
+                         encoding='cp1252',
+                         on_bad_lines='skip',
+                         keep_default_na=False,
+                         dtype={'symbol': str, 'name': str, 'timestamp': str})
+        df = df[df['symbol'] != ''].drop_duplicates('symbol', keep='last')
+        with self._locked():
+            self._write(self._to_table(df))
+        logger.info(f"Imported {len(df)} rows from {csv_file} into {self.path}")
+
+    def export_csv(self, csv_file='all_stocks.csv'):
+        df = self.read()
+        df.to_csv(csv_file, index=False, encoding='cp1252', errors='replace',
+                  date_format='%Y-%m-%dT%H:%M:%S.%f')
+        logger.info(f"Exported {len(df)} rows to {csv_file}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    if len(sys.argv) < 2 or sys.argv[1] not in ('import', 'export'):
+        print("usage: python fundamentals_store.py import|export [csv_file]")
+        sys.exit(1)
+    store = FundamentalsStore()
+    csv_file = sys.argv[2] if len(sys.argv) > 2 else 'all_stocks.csv'
+    if sys.argv[1] == 'import':
+        store.import_csv(csv_file)
+    else:
+        store.export_csv(csv_file)
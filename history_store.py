@@ -0,0 +1,120 @@
+# ./history_store.py
+import os
+import glob
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# yfinance column name -> stored column and type
+COLUMNS = {
+    'Open': ('open', pa.float32()),
+    'High': ('high', pa.float32()),
+    'Low': ('low', pa.float32()),
+    'Close': ('close', pa.float32()),
+    'Volume': ('volume', pa.int64()),
+    'Dividends': ('dividends', pa.float32()),
+    'Stock Splits': ('splits', pa.float32()),
+}
+
+SCHEMA = pa.schema([('date', pa.int64())] + [(name, dtype) for name, dtype in COLUMNS.values()])
+
+SUFFIX = '_history.arrow'
+
+
+class HistoryStore:
+    # One uncompressed Arrow IPC file per symbol: int64 epoch-ns UTC dates plus
+    # float32 prices. Files are memory-mapped, so a date-range read only touches
+    # the rows it returns.
+
+    def __init__(self, cache_dir='./chart_cache'):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, symbol):
+        return os.path.join(self.cache_dir, f"{symbol}{SUFFIX}")
+
+    def exists(self, symbol):
+        return os.path.exists(self.path(symbol))
+
+    def version(self, symbol):
+        path = self.path(symbol)
+        return os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+
+    def is_fresh(self, symbol, max_age):
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return False
+        return datetime.now() - datetime.fromtimestamp(os.path.getmtime(path)) < max_age
+
+    def symbols(self):
+        return sorted(os.path.basename(p)[:-len(SUFFIX)]
+                      for p in glob.glob(os.path.join(self.cache_dir, f"*{SUFFIX}")))
+
+    def write(self, symbol, history):
+        index = pd.DatetimeIndex(history.index)
+        tz = str(index.tz) if index.tz is not None else 'UTC'
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+        arrays = [pa.array(index.tz_convert('UTC').asi8, pa.int64())]
+        for column, (_, dtype) in COLUMNS.items():
+            values = history[column] if column in history else pd.Series(0, index=history.index)
+            arrays.append(pa.array(values.to_numpy(), dtype, from_pandas=True))
+        table = pa.Table.from_arrays(arrays, schema=SCHEMA.with_metadata({'tz': tz}))
+        # A temp file of its own per write, so concurrent writers of one symbol
+        # never replace each other's half-written file
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{symbol}.", suffix='.tmp', dir=self.cache_dir)
+        os.close(fd)
+        try:
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, self.path(symbol))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def read_table(self, symbol, start=None, end=None, columns=None):
+        # Zero-copy slice of the mapped file; start/end are inclusive bounds
+        table = feather.read_table(self.path(symbol), memory_map=True)
+        if start is not None or end is not None:
+            tz = _table_tz(table)
+            dates = table.column('date').to_numpy()
+            lo = 0 if start is None else np.searchsorted(dates, _epoch_ns(start, tz), 'left')
+            hi = len(dates) if end is None else np.searchsorted(dates, _epoch_ns(end, tz), 'right')
+            table = table.slice(lo, max(0, hi - lo))
+        if columns is not None:
+            table = table.select(['date'] + [c for c in columns if c != 'date'])
+        return table
+
+    def read_daily_closes(self, symbol, start=None, end=None):
+        # (local exchange dates as datetime64[D], float32 closes) without building a frame
+        table = self.read_table(symbol, start, end, columns=['close'])
+        local = pd.to_datetime(table.column('date').to_numpy(), utc=True).tz_convert(_table_tz(table))
+        days = local.tz_localize(None).normalize().to_numpy().astype('datetime64[D]')
+        return days, table.column('close').to_numpy()
+
+    def read(self, symbol, start=None, end=None):
+        # Returns the frame in yfinance's shape so callers can treat it like history()
+        table = self.read_table(symbol, start, end)
+        index = pd.DatetimeIndex(pd.to_datetime(table.column('date').to_numpy(), utc=True),
+                                 name='Date').tz_convert(_table_tz(table))
+        return pd.DataFrame({column: table.column(name).to_numpy()
+                             for column, (name, _) in COLUMNS.items()}, index=index)
+
+
+def dividends_from(history):
+    dividends = history['Dividends']
+    return dividends[dividends != 0]
+
+
+def _table_tz(table):
+    return (table.schema.metadata or {}).get(b'tz', b'UTC').decode()
+
+
+def _epoch_ns(value, tz):
+    # Naive bounds are taken to be in the symbol's exchange timezone
+    ts = pd.Timestamp(value)
+    if ts.tz is None:
+        ts = ts.tz_localize(tz)
+    return ts.value
@@ -0,0 +1,153 @@
+# listGetter/discovery.py
+
+import io
+import os
+import json
+import logging
+from time import monotonic
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from bs4 import BeautifulSoup
+import metrics
+import transport
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+
+def parse_screener(body):
+    return {row['symbol'] for row in json.loads(body)['data']['rows']}
+
+
+def parse_symbol_directory(column):
+    # nasdaqtrader.com pipe files: a header row, one row per issue and a
+    # trailing "File Creation Time" row; test issues are skipped
+    def parse(body):
+        df = pd.read_csv(io.BytesIO(body), sep='|', dtype=str, keep_default_na=False,
+                         on_bad_lines='skip')
+        df = df[~df[column].str.startswith('File Creation Time')]
+        if 'Test Issue' in df.columns:
+            df = df[df['Test Issue'] != 'Y']
+        return set(df[column].str.strip()) - {''}
+    return parse
+
+
+def parse_marketwatch(body):
+    soup = BeautifulSoup(body, 'html.parser')
+    return {a.text.strip() for a in soup.select('td.symbolcol a')} - {''}
+
+
+# name -> (url, query params, parser)
+SOURCES = {
+    'nasdaq_screener': ('https://api.nasdaq.com/api/screener/stocks',
+                        {'download': 'true'}, parse_screener),
+    'nasdaq_listed': ('https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt',
+                      None, parse_symbol_directory('Symbol')),
+    'nasdaq_traded': ('https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqtraded.txt',
+                      None, parse_symbol_directory('Symbol')),
+    'other_listed': ('https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt',
+                     None, parse_symbol_directory('ACT Symbol')),
+    'marketwatch': ('https://www.marketwatch.com/investing/stocks/companylist',
+                    None, parse_marketwatch),
+}
+
+
+class SourceCache:
+    # Last payload of every source with the validators needed for a conditional GET
+
+    def __init__(self, cache_dir='source_cache'):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, name):
+        base = os.path.join(self.cache_dir, name)
+        return base + '.body', base + '.json'
+
+    def load(self, name):
+        body_path, meta_path = self._paths(name)
+        if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+            return None, {}
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            return f.read(), meta
+
+    def save(self, name, body, meta):
+        body_path, meta_path = self._paths(name)
+        # Body first, so the validators never describe a payload we don't have
+        for path, mode, data in ((body_path, 'wb', body),
+                                 (meta_path, 'w', json.dumps(meta))):
+            with open(path + '.tmp', mode) as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+
+
+class SymbolDiscovery:
+    def __init__(self, sources=None, cache=None, timeout=30):
+        self.sources = sources or SOURCES
+        self.cache = cache or SourceCache()
+        self.timeout = timeout
+        self.session = transport.get_session(pool_size=max(10, len(self.sources)))
+
+    def fetch(self, name):
+        # Returns (symbols, status); unchanged sources are answered with 304
+        # and parsed from the cached payload, failures fall back to the cache
+        url, params, parse = self.sources[name]
+        cached_body, meta = self.cache.load(name)
+        headers = dict(HEADERS)
+        if cached_body is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        start = monotonic()
+        try:
+            response = self.session.get(url, headers=headers, params=params,
+                                        timeout=self.timeout)
+            if response.status_code == 304 and cached_body is not None:
+                body, status = cached_body, 'not_modified'
+            else:
+                response.raise_for_status()
+                body, status = response.content, 'fetched'
+                metrics.inc('discovery_bytes_total', len(body), source=name)
+            symbols = parse(body)
+            # Only a payload that parsed replaces the cached one
+            if status == 'fetched':
+                self.cache.save(name, body, {
+                    'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                })
+        except Exception as e:
+            try:
+                symbols, status = parse(cached_body), 'stale'
+                logger.warning(f"{name}: {e}; using the cached list")
+            except Exception:
+                logger.error(f"{name}: {e}")
+                metrics.inc('discovery_requests_total', source=name, status='failed')
+                return set(), 'failed'
+
+        metrics.inc('discovery_requests_total', source=name, status=status)
+        logger.info(f"{name}: {len(symbols)} symbols ({status}, {monotonic() - start:.2f}s)")
+        return symbols, status
+
+    def discover(self):
+        # All sources at once, so the run takes about as long as the slowest one
+        start = monotonic()
+        with ThreadPoolExecutor(max_workers=len(self.sources),
+                                thread_name_prefix='discovery') as executor:
+            futures = {name: executor.submit(self.fetch, name) for name in self.sources}
+            results = {name: future.result()[0] for name, future in futures.items()}
+        logger.info(f"Discovery finished in {monotonic() - start:.2f}s")
+        return results
+
+    @staticmethod
+    def membership(results):
+        # One row per symbol seen anywhere, one 0/1 column per source
+        all_symbols = sorted(set().union(*results.values()))
+        table = pd.DataFrame({'symbol': all_symbols})
+        for name, symbols in results.items():
+            table[name] = table['symbol'].isin(symbols).astype('int8')
+        return table
@@ -1,35 +1,57 @@
 # ./listGetter/listGetter.py 
  
-import requests
+import os
+import sys
+import argparse
 import pandas as pd
 from datetime import datetime
 import logging
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from universe import Universe, fetch_nasdaq_symbols
+from discovery import SymbolDiscovery
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def get_all_symbols():
-    url = 'https://api.nasdaq.com/api/screener/stocks'
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    params = {'download': 'true'}
-    
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
-        return [{'symbol': row['symbol'], 'timestamp': datetime.now().isoformat()} 
-                for row in data['data']['rows']]
+        df = fetch_nasdaq_symbols()
+        timestamp = datetime.now().isoformat()
+        return [{'symbol': symbol, 'timestamp': timestamp} for symbol in df['symbol']]
     except Exception as e:
         logger.error(f"Error fetching symbols: {e}")
         return []
 
 def main():
-    symbols = get_all_symbols()
-    logger.info(f"Found {len(symbols)} symbols")
-    
-    df = pd.DataFrame(symbols)
+    # Store a versioned snapshot and log what changed since the previous one
+    try:
+        current, delta = Universe().refresh()
+    except Exception as e:
+        logger.error(f"Error fetching symbols: {e}")
+        return
+    logger.info(f"Found {len(current)} symbols")
+    for old_symbol, new_symbol in delta['renamed']:
+        logger.info(f"Renamed {old_symbol} -> {new_symbol}")
+
+    # symbols.csv is kept for anything still reading the flat list
+    df = pd.DataFrame({'symbol': current['symbol'], 'timestamp': datetime.now().isoformat()})
     df.to_csv('symbols.csv', index=False)
     logger.info("Symbols written to symbols.csv")
 
+def discover_all(output='symbol_sources.csv'):
+    # Every source at once; writes which source lists which symbol
+    discovery = SymbolDiscovery()
+    table = discovery.membership(discovery.discover())
+    table.to_csv(output, index=False)
+    logger.info(f"{len(table)} symbols across {len(discovery.sources)} sources written to {output}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fetch the listed symbol universe")
+    parser.add_argument('--all-sources', metavar='PATH', nargs='?', const='symbol_sources.csv',
+                        help="query every symbol source and write the membership table")
+    args = parser.parse_args()
+    if args.all_sources:
+        discover_all(args.all_sources)
+    else:
+        main()
@@ -1,15 +1,44 @@
 # ./main.py
+#
+# Only the screener's modules are imported up front; chart_view (yfinance,
+# Plotly) and prefetch are imported the first time they are needed.
+from time import perf_counter
+_script_start = perf_counter()
+
+import os
+import logging
 import streamlit as st
-from table_view import TableView
-from chart_view import ChartView
+import metrics
+from table_view import TableView, RANK_FACTORS, VIEW_COLUMNS
+
+logger = logging.getLogger(__name__)
 
 st.set_page_config(page_title="Stock Filter", layout="wide")
 st.title("Stock Filter")
 
 table_view = TableView()
-chart_view = ChartView()
 
-df = table_view.load_data()
+PAGE_SIZE = 50
+
+def get_chart_view():
+    # Built on first use and kept for the rest of the session
+    if 'chart_view' not in st.session_state:
+        with metrics.timer('app_phase_seconds', phase='chart_init'):
+            from chart_view import ChartView
+            st.session_state['chart_view'] = ChartView()
+    return st.session_state['chart_view']
+
+def report_startup():
+    # Time to the first table of a session, logged once and kept in the metrics
+    if st.session_state.get('startup_reported'):
+        return
+    st.session_state['startup_reported'] = True
+    elapsed = perf_counter() - _script_start
+    metrics.observe('app_startup_seconds', elapsed)
+    logger.info(f"First table rendered {elapsed * 1000:.0f} ms after script start")
+
+with metrics.timer('app_phase_seconds', phase='load'):
+    df = table_view.load_data(compact=True)
 
 if df is not None:
     col1, col2, col3 = st.columns(3)
@@ -24,22 +53,84 @@ if df is not None:
         min_market_cap = st.number_input("Minimum Market Cap (Billions $)", value=1.0, step=0.1)
         min_cash = st.number_input("Minimum Cash (Billions $)", value=1.0, step=0.1)
         min_fcf_yield = st.number_input("Minimum FCF Yield (%)", value=5.0, step=0.1)
+        min_div_streak = st.number_input("Minimum Dividend Streak (Years)", value=0.0, step=1.0)
+        min_div_growth = st.number_input("Minimum 5-Year Dividend Growth (%)", value=0.0, step=0.5)
 
-    filtered_df = table_view.filter_data(
-        df, min_age, min_dividend, min_market_cap,
-        max_pe, max_debt_equity, max_payout,
-        min_cash, min_fcf_yield
-    )
+    with st.expander("Ranking"):
+        rank = st.checkbox("Rank matches by composite score", key='rank')
+        top_k = st.number_input("Keep top", min_value=10, value=200, step=50, key='top_k')
+        weight_columns = st.columns(len(RANK_FACTORS))
+        weights = {}
+        for column, (label, _) in RANK_FACTORS.items():
+            with weight_columns[len(weights)]:
+                weights[column] = st.slider(f"{label} weight", 0.0, 3.0, 1.0, 0.25,
+                                            key=f'weight_{column}')
+
+    with metrics.timer('app_phase_seconds', phase='filter'):
+        filtered_df = table_view.filter_data(
+            df, min_age, min_dividend, min_market_cap,
+            max_pe, max_debt_equity, max_payout,
+            min_cash, min_fcf_yield,
+            min_div_streak, min_div_growth
+        )
 
     st.write(f"Found {len(filtered_df)} matching stocks")
+    if rank and not filtered_df.empty:
+        with metrics.timer('app_phase_seconds', phase='rank'):
+            filtered_df = table_view.rank_data(filtered_df, weights, int(top_k))
+        st.write(f"Showing the top {len(filtered_df)} by score")
     
     if not filtered_df.empty:
         st.selectbox("Select Stock", options=filtered_df['symbol'].tolist(), key='selected_symbol')
 
-        tab1, tab2 = st.tabs(["Table", "Charts"])
-        
-        with tab1:
-            table_view.render(filtered_df)
-        
-        with tab2:
-            chart_view.render()
\ No newline at end of file
+        # A radio rather than st.tabs: tabs run both bodies on every rerun,
+        # which would load the chart stack before the table is shown
+        view = st.radio("View", ["Table", "Charts", "Compare"], horizontal=True,
+                        label_visibility='collapsed', key='view')
+
+        if view == "Table":
+            # Sorting and paging happen here so only one page is sent to the browser
+            sort_col, page_col = st.columns([3, 1])
+            with sort_col:
+                sort_options = (['score'] if 'score' in filtered_df.columns else []) + VIEW_COLUMNS
+                sort_by = st.selectbox("Sort by", [None] + sort_options, key='sort_by',
+                                       format_func=lambda c: "Default order" if c is None else c)
+                descending = st.checkbox("Descending", key='sort_descending')
+            with page_col:
+                pages = table_view.page_count(filtered_df, PAGE_SIZE)
+                page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages,
+                                       value=1, step=1, key='page') if pages > 1 else 1
+            page_df = table_view.page(filtered_df, page, PAGE_SIZE, sort_by, not descending)
+            with metrics.timer('app_phase_seconds', phase='render_table'):
+                table_view.render(filtered_df, page_df)
+            report_startup()
+        else:
+            if view == "Charts":
+                with metrics.timer('app_phase_seconds', phase='render_chart'):
+                    get_chart_view().render()
+            else:
+                with metrics.timer('app_phase_seconds', phase='render_compare'):
+                    get_chart_view().render_comparison(filtered_df['symbol'].tolist())
+
+            # Warm the chart cache for the matches so switching symbols never
+            # waits on Yahoo; only once charts are in use, so the table path
+            # never loads yfinance or downloads anything
+            from prefetch import start_background_prefetch
+            start_background_prefetch(filtered_df['symbol'].head(500).tolist())
+
+if metrics.ENABLED:
+    metrics.inc('app_reruns_total')
+    metrics.write(os.environ.get('FINANCE_METRICS_FILE', 'app_metrics.prom'))
+    with st.sidebar:
+        st.write("### Metrics")
+        snapshot = metrics.snapshot()
+        for histogram in snapshot['histograms']:
+            labels = ','.join(f"{k}={v}" for k, v in histogram['labels'].items())
+            mean_ms = histogram['sum'] / histogram['count'] * 1000 if histogram['count'] else 0
+            st.write(f"`{histogram['name']}` {labels}: {histogram['count']} calls, "
+                     f"mean {mean_ms:.1f} ms")
+        cache = {c['labels'].get('result'): c['value'] for c in snapshot['counters']
+                 if c['name'] == 'chart_cache_requests_total'}
+        if cache:
+            hits = cache.get('hit', 0) + cache.get('incremental', 0)
+            st.metric("Chart cache hit ratio", f"{hits / sum(cache.values()):.0%}")
\ No newline at end of file
@@ -0,0 +1,135 @@
+# ./metrics.py
+#
+# In-process counters and latency histograms for the app and the scraper.
+# Disabled unless FINANCE_METRICS=1; when disabled every call returns at once.
+import os
+import json
+import threading
+from time import perf_counter
+
+ENABLED = os.environ.get('FINANCE_METRICS', '').lower() in ('1', 'true', 'yes')
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(DEFAULT_BUCKETS),
+                                            'count': 0, 'sum': 0.0}
+        histogram['count'] += 1
+        histogram['sum'] += seconds
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if seconds <= bound:
+                histogram['buckets'][i] += 1
+                break
+
+
+class _Timer:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name, **labels):
+    # with metrics.timer('filter_seconds'): ...
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def snapshot():
+    with _lock:
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(_counters.items())]
+        histograms = [{'name': name, 'labels': dict(labels), 'count': h['count'],
+                       'sum': h['sum'], 'buckets': dict(zip(DEFAULT_BUCKETS, h['buckets']))}
+                      for (name, labels), h in sorted(_histograms.items())]
+    return {'counters': counters, 'histograms': histograms}
+
+
+def _labels_text(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+def to_prometheus():
+    data = snapshot()
+    lines = []
+    for counter in data['counters']:
+        lines.append(f"{counter['name']}{_labels_text(counter['labels'])} {counter['value']}")
+    for histogram in data['histograms']:
+        name, labels = histogram['name'], histogram['labels']
+        cumulative = 0
+        for bound, count in histogram['buckets'].items():
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels_text(labels, {'le': bound})} {cumulative}")
+        lines.append(f"{name}_bucket{_labels_text(labels, {'le': '+Inf'})} {histogram['count']}")
+        lines.append(f"{name}_sum{_labels_text(labels)} {histogram['sum']:.6f}")
+        lines.append(f"{name}_count{_labels_text(labels)} {histogram['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def write(path):
+    # Prometheus text format unless the path ends in .json
+    if not ENABLED:
+        return
+    text = json.dumps(snapshot(), indent=2) if path.endswith('.json') else to_prometheus()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,152 @@
+# ./prefetch.py
+import os
+import json
+import argparse
+import logging
+import tempfile
+import threading
+from datetime import datetime, timedelta
+import yfinance as yf
+from history_store import HistoryStore
+import transport
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# yf.download collects its results in the module-level yfinance.shared._DFS
+# and clears it on every call, so two downloads at once lose each other's frames
+_download_lock = threading.Lock()
+_misses_lock = threading.Lock()
+
+# The one background prefetch of this process and the request waiting for it
+_lock = threading.Lock()
+_worker = None
+_pending = None
+
+MISSES_FILE = 'prefetch_misses.json'
+
+
+def _misses_path(store):
+    return os.path.join(store.cache_dir, MISSES_FILE)
+
+
+def _load_misses(store):
+    # symbol -> ISO time of the last download that returned nothing for it
+    try:
+        with open(_misses_path(store), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _update_misses(store, missed, fetched):
+    # Merged into whatever is on disk, since other prefetches may be running
+    with _misses_lock:
+        misses = _load_misses(store)
+        if not missed and not any(symbol in misses for symbol in fetched):
+            return
+        now = datetime.now().isoformat()
+        misses.update((symbol, now) for symbol in missed)
+        for symbol in fetched:
+            misses.pop(symbol, None)
+        fd, tmp_path = tempfile.mkstemp(prefix=MISSES_FILE + '.', dir=store.cache_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(misses, f)
+        os.replace(tmp_path, _misses_path(store))
+
+
+def _recent_miss(misses, symbol, max_age):
+    missed_at = misses.get(symbol)
+    return missed_at is not None and datetime.now() - datetime.fromisoformat(missed_at) < max_age
+
+
+def prefetch_histories(symbols, store=None, group_size=50, max_age=timedelta(days=1)):
+    # Bulk-download max history (with dividends and splits) for every symbol that
+    # is not already fresh in the chart cache, group_size tickers per request.
+    # Symbols Yahoo returned nothing for are not asked for again until max_age
+    store = store or HistoryStore()
+    misses = _load_misses(store)
+    missing = [s for s in dict.fromkeys(symbols)
+               if not store.is_fresh(s, max_age) and not _recent_miss(misses, s, max_age)]
+    logger.info(f"Prefetching {len(missing)} of {len(symbols)} symbols")
+
+    fetched = 0
+    for i in range(0, len(missing), group_size):
+        group = missing[i:i + group_size]
+        try:
+            with _download_lock:
+                # Another prefetch may have written some of these while this one waited
+                group = [s for s in group if not store.is_fresh(s, max_age)]
+                if not group:
+                    continue
+                data = yf.download(group, period="max", actions=True, auto_adjust=True,
+                                   group_by='ticker', ignore_tz=False, threads=True,
+                                   progress=False, session=transport.get_session())
+        except Exception as e:
+            logger.error(f"Prefetch error for {group[0]}..{group[-1]}: {e}")
+            continue
+
+        missed, written = [], []
+        for symbol in group:
+            if symbol not in data.columns.get_level_values(0):
+                missed.append(symbol)
+                continue
+            # Multi-ticker frames share one index; drop the dates this ticker lacks
+            history = data[symbol].dropna(subset=['Close'])
+            if history.empty:
+                missed.append(symbol)
+                continue
+            store.write(symbol, history)
+            written.append(symbol)
+        _update_misses(store, missed, written)
+        fetched += len(written)
+        if missed:
+            logger.info(f"No history for {len(missed)} symbols, skipping them for {max_age}")
+
+    logger.info(f"Prefetched {fetched} symbols")
+    return fetched
+
+
+def start_background_prefetch(symbols, **kwargs):
+    # One background prefetch per process. A request made while it runs waits
+    # for it and replaces any older waiting request, so reruns with new filters
+    # queue at most one download instead of starting another thread each
+    global _worker, _pending
+    with _lock:
+        _pending = (list(symbols), kwargs)
+        if _worker is not None and _worker.is_alive():
+            return _worker
+        _worker = threading.Thread(target=_run_pending, name="history-prefetch", daemon=True)
+        _worker.start()
+        return _worker
+
+
+def _run_pending():
+    global _worker, _pending
+    while True:
+        with _lock:
+            if _pending is None:
+                _worker = None
+                return
+            symbols, kwargs = _pending
+            _pending = None
+        try:
+            prefetch_histories(symbols, **kwargs)
+        except Exception as e:
+            logger.error(f"Background prefetch failed: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the chart cache for a set of symbols")
+    parser.add_argument('symbols', nargs='*', help="symbols to prefetch")
+    parser.add_argument('--all', action='store_true',
+                        help="prefetch every symbol in the fundamentals store")
+    parser.add_argument('--group-size', type=int, default=50,
+                        help="tickers per bulk download request")
+    args = parser.parse_args()
+
+    symbols = args.symbols
+    if args.all:
+        from fundamentals_store import FundamentalsStore
+        symbols = sorted(FundamentalsStore().symbols())
+    prefetch_histories(symbols, group_size=args.group_size)
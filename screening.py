@@ -0,0 +1,148 @@
+# ./screening.py
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class ScreeningEngine:
+    # Threshold screening over presorted column indexes.
+    #
+    # Each column is argsorted once (NaNs last), so a '>=' or '<=' predicate is a
+    # contiguous slice of that order found with searchsorted. The most selective
+    # predicate supplies the candidate rows and the rest are checked only on those
+    # candidates. Results are memoized per predicate tuple in a bounded LRU.
+
+    def __init__(self, df, cache_size=256):
+        self.df = df
+        self.cache_size = cache_size
+        self._indexes = {}
+        self._zstats = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index(self, column):
+        index = self._indexes.get(column)
+        if index is None:
+            # Compare in the column's own precision so a float32 value equal to
+            # the threshold still matches it
+            series = self.df[column]
+            values = series.to_numpy(dtype=np.float32 if series.dtype == np.float32 else float)
+            order = np.argsort(values, kind='stable')
+            sorted_values = values[order]
+            n_valid = len(values) - int(np.isnan(values).sum())
+            index = (values, order, sorted_values[:n_valid])
+            self._indexes[column] = index
+        return index
+
+    def _bounds(self, column, op, value):
+        _, _, sorted_values = self._index(column)
+        if op == '>=':
+            return np.searchsorted(sorted_values, value, 'left'), len(sorted_values)
+        if op == '<=':
+            return 0, np.searchsorted(sorted_values, value, 'right')
+        raise ValueError(f"Unsupported operator {op}")
+
+    def positions(self, predicates):
+        # predicates: tuple of (column, op, value); returns sorted row positions
+        key = tuple(predicates)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+            if not key:
+                result = np.arange(len(self.df))
+            else:
+                bounds = sorted((hi - lo, column, op, value, lo, hi)
+                                for column, op, value in key
+                                for lo, hi in [self._bounds(column, op, value)])
+                _, column, _, _, lo, hi = bounds[0]
+                candidates = self._index(column)[1][lo:hi]
+                for _, column, op, value, _, _ in bounds[1:]:
+                    if not len(candidates):
+                        break
+                    values = self._index(column)[0][candidates]
+                    # NaN compares False, matching a boolean mask filter
+                    keep = values >= value if op == '>=' else values <= value
+                    candidates = candidates[keep]
+                result = np.sort(candidates)
+
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return result
+
+    def filter(self, predicates):
+        return self.df.iloc[self.positions(predicates)]
+
+    def sorted_positions(self, predicates, column, ascending=True):
+        # Matches in column order, NaNs last, read off the presorted index with
+        # a membership mask; no sort per request. Memoized alongside positions
+        positions = self.positions(predicates)
+        key = ('sorted', tuple(predicates), column, ascending)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+            _, order, sorted_values = self._index(column)
+            member = np.zeros(len(self.df), dtype=bool)
+            member[positions] = True
+            valid, missing = order[:len(sorted_values)], order[len(sorted_values):]
+            if not ascending:
+                valid = valid[::-1]
+            result = np.concatenate([valid[member[valid]], missing[member[missing]]])
+
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return result
+
+    def _column_values(self, df, column, positive):
+        # yfinance reports some ratios as 'Infinity'; those count as missing
+        values = df[column].to_numpy(dtype=float)
+        invalid = ~np.isfinite(values)
+        if positive:
+            # e.g. a negative P/E is not a cheap stock, it is a loss-making one
+            invalid |= values <= 0
+        return np.where(invalid, np.nan, values)
+
+    def _stats(self, column, positive):
+        # Mean and standard deviation over the whole table, so a stock's score
+        # does not depend on which other stocks passed the thresholds
+        key = (column, positive)
+        stats = self._zstats.get(key)
+        if stats is None:
+            values = self._column_values(self.df, column, positive)
+            valid = values[np.isfinite(values)]
+            stats = (valid.mean(), valid.std()) if len(valid) else (0.0, 0.0)
+            self._zstats[key] = stats
+        return stats
+
+    def scores(self, df, weights, positive=()):
+        # weights: tuple of (column, weight); a negative weight means lower is
+        # better. Each column is z-scored and clipped to +-3 so one outlier
+        # cannot dominate; missing values score 0 (the table average)
+        total = np.zeros(len(df))
+        for column, weight in weights:
+            if not weight:
+                continue
+            mean, std = self._stats(column, column in positive)
+            if not np.isfinite(std) or std == 0:
+                continue
+            z = (self._column_values(df, column, column in positive) - mean) / std
+            total += weight * np.clip(np.nan_to_num(z, nan=0.0), -3.0, 3.0)
+        return total
+
+    def top_k(self, df, weights, k, positive=()):
+        # Best k rows of df by composite score, best first, with a 'score' column.
+        # argpartition finds the top k in linear time; only those k are sorted
+        scores = self.scores(df, weights, positive)
+        if k <= 0:
+            top = np.arange(0)
+        elif k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        order = top[np.argsort(-scores[top], kind='stable')]
+        return df.iloc[order].assign(score=scores[order])
@@ -1,78 +1,209 @@
 # ./table_view.py
+import hashlib
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
+import export
+import metrics
+from fundamentals_store import FundamentalsStore
+from screening import ScreeningEngine
+
+@st.cache_data
+def _load_fundamentals(data_version):
+    try:
+        # Typed Arrow columns; no CSV parsing on the hot path
+        df = FundamentalsStore().read()
+        return df
+    except Exception as e:
+        st.error(f"Data loading error: {e}")
+        return None
+
+# Everything the screen filters on or shows; compact mode loads nothing else
+VIEW_COLUMNS = [
+    'symbol', 'name', 'market_cap', 'dividend_yield', 'age_years',
+    'pe_ratio', 'debt_to_equity', 'payout_ratio', 'total_cash',
+    'free_cash_flow', 'free_cash_flow_yield', 'div_streak_years',
+    'div_growth_5y', 'div_impact_avg'
+]
+
+# Dollar columns stored in dollars and shown in billions
+BILLIONS_COLUMNS = ['market_cap', 'total_cash', 'free_cash_flow']
+
+# Ranking factors: column -> (label, direction); -1 means lower is better
+RANK_FACTORS = {
+    'dividend_yield': ("Dividend Yield", 1),
+    'free_cash_flow_yield': ("FCF Yield", 1),
+    'pe_ratio': ("P/E Ratio", -1),
+    'debt_to_equity': ("Debt/Equity", -1),
+    'payout_ratio': ("Payout Ratio", -1),
+    # Average % move from the open before to the close after each ex-dividend
+    # date over the last year; a smaller drop is better
+    'div_impact_avg': ("Ex-Div Impact", 1),
+}
+
+# Non-positive values of these mean "not meaningful", not "very good"; the
+# scraper stores 0 for a debt/equity Yahoo does not report
+POSITIVE_ONLY = ('pe_ratio', 'debt_to_equity', 'payout_ratio')
+
+@st.cache_resource(max_entries=2)
+def _load_compact(data_version, columns):
+    # One read-only frame shared by every session instead of a pickled copy each
+    try:
+        return FundamentalsStore().read_compact(list(columns))
+    except Exception as e:
+        st.error(f"Data loading error: {e}")
+        return None
+
+@st.cache_resource(max_entries=2)
+def _screening_engine(_df, data_version, columns):
+    # Shared by every session; rebuilt only when the store file changes.
+    # columns tells apart the frames load_data caches for one version
+    return ScreeningEngine(_df)
+
+@st.cache_resource(max_entries=8)
+def _export_bytes(signature, fmt, _make_table):
+    # Encoded once per result set and format; later downloads reuse the bytes
+    with metrics.timer('app_phase_seconds', phase='export'):
+        return export.encode(_make_table(), fmt)
 
 class TableView:
-    @st.cache_data
-    def load_data(_self):
-        try:
-            df = pd.read_csv('all_stocks.csv', 
-                            encoding='cp1252',
-                            on_bad_lines='skip',
-                            dtype={
-                                'symbol': str,
-                                'name': str,
-                                'market_cap': float,
-                                'dividend_yield': float,
-                                'age_years': float,
-                                'pe_ratio': float,
-                                'debt_to_equity': float,
-                                'payout_ratio': float,
-                                'total_cash': float,
-                                'free_cash_flow': float,
-                                'free_cash_flow_yield': float,
-                                'timestamp': str
-                            })
-            return df
-        except Exception as e:
-            st.error(f"Data loading error: {e}")
-            return None
+    def __init__(self):
+        self.data_version = None
+        self.engine = None
+        self._predicates = None
+        self._filtered = None
+
+    def load_data(self, compact=False, columns=VIEW_COLUMNS):
+        # compact=True returns a shared frame that callers must not modify
+        self.data_version = FundamentalsStore().version()
+        if compact:
+            return _load_compact(self.data_version, tuple(columns))
+        return _load_fundamentals(self.data_version)
 
     def filter_data(self, df, min_age, min_dividend, min_market_cap, 
                    max_pe=None, max_debt_equity=None, max_payout=None, 
-                   min_cash=None, min_fcf_yield=None):
-        mask = (
-            (df['age_years'] >= min_age) &
-            (df['dividend_yield'] >= min_dividend) &
-            (df['market_cap'] >= min_market_cap * 1_000_000_000)
-        )
+                   min_cash=None, min_fcf_yield=None,
+                   min_div_streak=None, min_div_growth=None):
+        predicates = [
+            ('age_years', '>=', min_age),
+            ('dividend_yield', '>=', min_dividend),
+            ('market_cap', '>=', min_market_cap * 1_000_000_000)
+        ]
         
         if max_pe is not None and max_pe > 0:
-            mask &= (df['pe_ratio'] <= max_pe)
+            predicates.append(('pe_ratio', '<=', max_pe))
         if max_debt_equity is not None and max_debt_equity > 0:
-            mask &= (df['debt_to_equity'] <= max_debt_equity)
+            predicates.append(('debt_to_equity', '<=', max_debt_equity))
         if max_payout is not None and max_payout > 0:
-            mask &= (df['payout_ratio'] <= max_payout)
+            predicates.append(('payout_ratio', '<=', max_payout))
         if min_cash is not None and min_cash > 0:
-            mask &= (df['total_cash'] >= min_cash * 1_000_000_000)
+            predicates.append(('total_cash', '>=', min_cash * 1_000_000_000))
         if min_fcf_yield is not None and min_fcf_yield > 0:
-            mask &= (df['free_cash_flow_yield'] >= min_fcf_yield)
-            
-        return df[mask].copy()
+            predicates.append(('free_cash_flow_yield', '>=', min_fcf_yield))
+        if min_div_streak is not None and min_div_streak > 0:
+            predicates.append(('div_streak_years', '>=', min_div_streak))
+        if min_div_growth is not None and min_div_growth > 0:
+            predicates.append(('div_growth_5y', '>=', min_div_growth))
+        
+        # The cached engine belongs to the loaded table; any other frame gets its own
+        if self.data_version is not None:
+            engine = _screening_engine(df, self.data_version, tuple(df.columns))
+            if engine.df is not df:
+                engine = ScreeningEngine(df)
+        else:
+            engine = ScreeningEngine(df)
+        self.engine = engine
+        self._predicates = tuple(predicates)
+        self._filtered = engine.filter(self._predicates)
+        return self._filtered
 
-    def render(self, filtered_df):
+    def rank_data(self, filtered_df, weights, top_k=200):
+        # weights: {column: weight >= 0} over RANK_FACTORS; z-scores use the
+        # statistics of the table filter_data last screened
+        engine = self.engine or ScreeningEngine(filtered_df)
+        signed = tuple((column, weight * RANK_FACTORS[column][1])
+                       for column, weight in weights.items())
+        return engine.top_k(filtered_df, signed, top_k, positive=POSITIVE_ONLY)
+
+    @staticmethod
+    def page_count(df, page_size=50):
+        return max(1, -(-len(df) // page_size))
+
+    def page(self, df, page, page_size=50, sort_by=None, ascending=True):
+        # One page of df, optionally sorted on the server; page is 1-based and
+        # clamped. Only the rows of the page are materialized
+        page = min(max(1, page), self.page_count(df, page_size))
+        rows = slice((page - 1) * page_size, page * page_size)
+        if sort_by is None:
+            return df.iloc[rows]
+        if df is self._filtered and pd.api.types.is_numeric_dtype(df[sort_by]):
+            # Straight from the screen: reuse the engine's presorted column index
+            positions = self.engine.sorted_positions(self._predicates, sort_by, ascending)
+            return self.engine.df.iloc[positions[rows]]
+        order = df[sort_by].reset_index(drop=True).sort_values(
+            ascending=ascending, na_position='last', kind='stable').index.to_numpy()
+        return df.iloc[order[rows]]
+
+    def render(self, filtered_df, page_df=None):
+        # Shows page_df (default: everything); the download is always the full result.
+        # Units are display formatting on the shown rows only; the data is not copied
         if not filtered_df.empty:
-            display_df = filtered_df.copy()
-            display_df['market_cap'] = (display_df['market_cap'] / 1e9).round(2)
-            display_df['total_cash'] = (display_df['total_cash'] / 1e9).round(2)
-            display_df['free_cash_flow'] = (display_df['free_cash_flow'] / 1e9).round(2)
-            
-            columns_to_display = [
-                'symbol', 'name', 'market_cap', 'dividend_yield', 'age_years',
-                'pe_ratio', 'debt_to_equity', 'payout_ratio', 'total_cash',
-                'free_cash_flow', 'free_cash_flow_yield'
-            ]
-            
+            page_df = filtered_df if page_df is None else page_df
+            columns = VIEW_COLUMNS
+            formats = {column: lambda v: f"{v / 1e9:,.2f}" for column in BILLIONS_COLUMNS}
+            if 'score' in page_df.columns:
+                columns = ['score'] + VIEW_COLUMNS
+                formats['score'] = '{:.2f}'
+
             st.dataframe(
-                display_df[columns_to_display],
+                page_df[columns].style.format(formats, na_rep=''),
                 hide_index=True,
-                use_container_width=True
+                use_container_width=True,
+                column_config={column: f"{column} ($B)" for column in BILLIONS_COLUMNS}
             )
             
-            if st.button("Download Results"):
-                st.download_button(
-                    "Download CSV",
-                    filtered_df.to_csv(index=False),
-                    "filtered_stocks.csv",
-                    "text/csv"
-                )
\ No newline at end of file
+            self.render_export(filtered_df)
+
+    def export_signature(self, filtered_df):
+        # Same data version and same rows in the same order -> same export
+        digest = hashlib.sha1(filtered_df.index.to_numpy().tobytes())
+        if 'score' in filtered_df.columns:
+            digest.update(filtered_df['score'].to_numpy().tobytes())
+        return f"{self.data_version}:{digest.hexdigest()}"
+
+    def _matches_table(self, filtered_df):
+        extra = {'score': filtered_df['score'].to_numpy()} if 'score' in filtered_df.columns else None
+        table = export.matches_table(FundamentalsStore(), filtered_df.index.to_numpy(),
+                                     self.data_version, extra)
+        if table is None:
+            table = pa.Table.from_pandas(filtered_df, preserve_index=False)
+        return table
+
+    def render_export(self, filtered_df):
+        fmt_col, scope_col, button_col = st.columns(3)
+        with fmt_col:
+            fmt = st.radio("Format", list(export.EXPORT_FORMATS), horizontal=True,
+                           key='export_format')
+        with scope_col:
+            scope = st.radio("Rows", ["Matches", "Full universe"], horizontal=True,
+                             key='export_scope')
+        if scope == "Matches":
+            signature = self.export_signature(filtered_df)
+            make_table = lambda: self._matches_table(filtered_df)
+            file_name = 'filtered_stocks'
+        else:
+            signature = f"{self.data_version}:all"
+            make_table = lambda: FundamentalsStore().read_table()
+            file_name = 'all_stocks'
+
+        mime, extension = export.EXPORT_FORMATS[fmt]
+        with button_col:
+            # Encoding waits for an explicit request; once prepared, the download
+            # button stays up for as long as the rows and format are unchanged
+            prepared = (signature, fmt)
+            if st.session_state.get('export_prepared') != prepared:
+                if not st.button("Prepare download"):
+                    return
+                st.session_state['export_prepared'] = prepared
+            st.download_button(f"Download {fmt}", _export_bytes(signature, fmt, make_table),
+                               file_name + extension, mime)
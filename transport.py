@@ -0,0 +1,233 @@
+# ./transport.py
+#
+# Shared HTTP layer for the Nasdaq and Yahoo calls.
+#
+#   FINANCE_HTTP_MODE=live     plain pooled requests session (default)
+#   FINANCE_HTTP_MODE=record   live session that also records every response
+#                              into FINANCE_HTTP_ARCHIVE
+#   FINANCE_HTTP_MODE=replay   requests are served from the archive by a local
+#                              stand-in server; FINANCE_HTTP_SPEED scales the
+#                              recorded latency (1 = as recorded, 0 = no delay)
+import os
+import sys
+import gzip
+import json
+import base64
+import atexit
+import logging
+import threading
+from time import sleep
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+
+logger = logging.getLogger(__name__)
+
+MODE = os.environ.get('FINANCE_HTTP_MODE', 'live')
+ARCHIVE = os.environ.get('FINANCE_HTTP_ARCHIVE', 'http_archive.jsonl.gz')
+SPEED = float(os.environ.get('FINANCE_HTTP_SPEED', '0'))
+
+# Query parameters that change between sessions and must not affect matching
+VOLATILE_PARAMS = {'crumb', '_', 'period2'}
+
+# Response headers worth replaying; bodies are stored decoded
+KEPT_HEADERS = {'content-type', 'set-cookie', 'etag', 'last-modified'}
+
+
+def request_key(method, url):
+    parts = urlsplit(url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                    if k not in VOLATILE_PARAMS)
+    return f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}?{urlencode(params)}"
+
+
+def route_key(method, url):
+    parts = urlsplit(url)
+    return f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class Archive:
+    # Gzipped JSON lines, one recorded response per line
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._by_route = {}
+        self._cursor = {}
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    self._index(json.loads(line))
+
+    def _index(self, entry):
+        self.entries.append(entry)
+        self._by_key.setdefault(request_key(entry['method'], entry['url']), []).append(entry)
+        self._by_route.setdefault(route_key(entry['method'], entry['url']), []).append(entry)
+
+    def record(self, method, url, response):
+        try:
+            body = {'text': response.content.decode('utf-8')}
+        except UnicodeDecodeError:
+            body = {'b64': base64.b64encode(response.content).decode('ascii')}
+        entry = {
+            'method': method.upper(),
+            'url': url,
+            'status': response.status_code,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS},
+            'elapsed': response.elapsed.total_seconds(),
+            **body,
+        }
+        with self._lock:
+            self._index(entry)
+
+    def lookup(self, method, url):
+        # Exact match first, then any response recorded for the same route;
+        # repeated requests cycle through the recorded responses in order
+        with self._lock:
+            for key, table in ((request_key(method, url), self._by_key),
+                               (route_key(method, url), self._by_route)):
+                candidates = table.get(key)
+                if candidates:
+                    i = self._cursor.get(key, 0)
+                    self._cursor[key] = i + 1
+                    return candidates[i % len(candidates)]
+        return None
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                for entry in self.entries:
+                    f.write(json.dumps(entry) + '\n')
+            os.replace(tmp_path, self.path)
+        logger.info(f"Saved {len(self.entries)} responses to {self.path}")
+
+
+def entry_body(entry):
+    if 'b64' in entry:
+        return base64.b64decode(entry['b64'])
+    return entry.get('text', '').encode('utf-8')
+
+
+class RecordingSession(requests.Session):
+    def __init__(self, archive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        self.archive.record(request.method, request.url, response)
+        return response
+
+
+class ReplayServer(ThreadingHTTPServer):
+    # Serves archived responses at /<scheme>/<host>/<path>?<query>
+    daemon_threads = True
+
+    def __init__(self, archive, speed=0.0, port=0):
+        self.archive = archive
+        self.speed = speed
+        super().__init__(('127.0.0.1', port), _ReplayHandler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name="http-replay", daemon=True)
+        thread.start()
+        return self
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    def _replay(self):
+        scheme, _, rest = self.path.lstrip('/').partition('/')
+        url = f"{scheme}://{rest}"
+        entry = self.server.archive.lookup(self.command, url)
+        if entry is None:
+            self.send_error(404, f"Not recorded: {url}")
+            return
+        if self.server.speed > 0:
+            sleep(entry['elapsed'] / self.server.speed)
+        body = entry_body(entry)
+        self.send_response(entry['status'])
+        for name, value in entry['headers'].items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _replay
+    do_POST = _replay
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class ReplaySession(requests.Session):
+    # Rewrites every request onto the stand-in server, keeping the original
+    # scheme and host in the path so the server can find the recording
+    def __init__(self, server_url):
+        super().__init__()
+        self.server_url = server_url
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        query = f"?{parts.query}" if parts.query else ''
+        request.url = f"{self.server_url}/{parts.scheme}/{parts.netloc}{parts.path}{query}"
+        return super().send(request, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _pooled(session, pool_size):
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session(pool_size=10):
+    # One shared session per process, built for the configured mode
+    global _session
+    with _session_lock:
+        if _session is not None:
+            return _session
+        if MODE == 'record':
+            archive = Archive(ARCHIVE)
+            atexit.register(archive.save)
+            _session = RecordingSession(archive)
+            logger.info(f"Recording HTTP responses to {ARCHIVE}")
+        elif MODE == 'replay':
+            server = ReplayServer(Archive(ARCHIVE), SPEED).start()
+            _session = ReplaySession(server.url)
+            logger.info(f"Replaying HTTP responses from {ARCHIVE} via {server.url}")
+        else:
+            _session = requests.Session()
+        _pooled(_session, pool_size)
+        return _session
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    if len(sys.argv) < 3 or sys.argv[1] not in ('serve', 'stats'):
+        print("usage: python transport.py serve|stats ARCHIVE [port] [speed]")
+        sys.exit(1)
+    archive = Archive(sys.argv[2])
+    if sys.argv[1] == 'stats':
+        routes = {}
+        for entry in archive.entries:
+            route = route_key(entry['method'], entry['url'])
+            routes[route] = routes.get(route, 0) + 1
+        for route, count in sorted(routes.items(), key=lambda item: -item[1]):
+            print(f"{count:8d}  {route}")
+    else:
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else 8765
+        speed = float(sys.argv[4]) if len(sys.argv) > 4 else 1.0
+        server = ReplayServer(archive, speed, port)
+        logger.info(f"Serving {len(archive.entries)} responses on {server.url}")
+        server.serve_forever()
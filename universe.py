@@ -0,0 +1,86 @@
+# ./universe.py
+import os
+import glob
+import logging
+from datetime import datetime
+import pandas as pd
+import transport
+
+logger = logging.getLogger(__name__)
+
+NASDAQ_SCREENER_URL = 'https://api.nasdaq.com/api/screener/stocks'
+
+
+def fetch_nasdaq_symbols():
+    # Every listed symbol with its company name, from the Nasdaq screener download
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    params = {'download': 'true'}
+    response = transport.get_session().get(NASDAQ_SCREENER_URL, headers=headers, params=params)
+    response.raise_for_status()
+    rows = response.json()['data']['rows']
+    return pd.DataFrame({'symbol': [row['symbol'] for row in rows],
+                         'name': [row.get('name', '') for row in rows]})
+
+
+class Universe:
+    # Versioned snapshots of the listed symbols, one CSV per fetch, so the
+    # scraper can tell what was added, delisted or renamed since the last run.
+
+    def __init__(self, snapshot_dir='universe', keep=30):
+        self.snapshot_dir = snapshot_dir
+        self.keep = keep
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    def snapshots(self):
+        return sorted(glob.glob(os.path.join(self.snapshot_dir, 'symbols_*.csv')))
+
+    def load(self, path):
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+    def latest(self):
+        snapshots = self.snapshots()
+        return self.load(snapshots[-1]) if snapshots else None
+
+    def latest_age(self):
+        snapshots = self.snapshots()
+        if not snapshots:
+            return None
+        return datetime.now() - datetime.fromtimestamp(os.path.getmtime(snapshots[-1]))
+
+    def save(self, df):
+        path = os.path.join(self.snapshot_dir, f"symbols_{datetime.now():%Y%m%dT%H%M%S_%f}.csv")
+        df.sort_values('symbol').to_csv(path, index=False)
+        for old in self.snapshots()[:-self.keep]:
+            os.remove(old)
+        return path
+
+    @staticmethod
+    def diff(old, new):
+        old_symbols = set(old['symbol']) if old is not None else set()
+        new_symbols = set(new['symbol'])
+        added = new_symbols - old_symbols
+        removed = old_symbols - new_symbols
+
+        # A removed and an added symbol sharing a unique company name is a ticker change
+        renamed = []
+        if old is not None and added and removed:
+            old_names = old[old['symbol'].isin(removed) & (old['name'] != '')]
+            new_names = new[new['symbol'].isin(added) & (new['name'] != '')]
+            old_names = old_names.drop_duplicates('name', keep=False)
+            new_names = new_names.drop_duplicates('name', keep=False)
+            matched = old_names.merge(new_names, on='name', suffixes=('_old', '_new'))
+            renamed = list(zip(matched['symbol_old'], matched['symbol_new']))
+
+        return {'added': sorted(added), 'removed': sorted(removed), 'renamed': sorted(renamed)}
+
+    def refresh(self):
+        # Fetch the current listing, store it as a new snapshot and return the delta
+        current = fetch_nasdaq_symbols()
+        if current.empty:
+            raise ValueError("Symbol source returned no rows; keeping the previous snapshot")
+        delta = self.diff(self.latest(), current)
+        path = self.save(current)
+        logger.info(f"Universe snapshot {path}: {len(current)} symbols, "
+                    f"{len(delta['added'])} added, {len(delta['removed'])} removed, "
+                    f"{len(delta['renamed'])} renamed")
+        return current, delta